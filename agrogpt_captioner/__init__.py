@@ -1,2 +1,2 @@
 from .image_captioner import caption_image
-
+from .engine import CaptionError, caption_engine
@@ -0,0 +1,184 @@
+# agrogpt_captioner/engine.py
+"""Captioning in a separate process pool, so model inference never runs in the web worker.
+
+Each pool process loads its model once in the initializer. Requests ship the
+still-encoded upload bytes (a few hundred KB, pickled straight onto the pool's
+pipe) rather than decoded pixel arrays, and the worker decodes them itself.
+"""
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.config import settings
+
+
+class CaptionError(Exception):
+    pass
+
+
+class CaptionTimeout(CaptionError):
+    pass
+
+
+class CaptionBusy(CaptionError):
+    pass
+
+
+# ─── Worker process side ───
+_captioner = None
+
+
+def _init_worker(model: str, model_kwargs: dict, num_threads: int):
+    global _captioner
+    # Keep BLAS/torch from oversubscribing the host: workers x threads <= cores
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+    # Model code (PIL, torch) is only ever imported in the pool processes
+    from .models import load_captioner
+
+    _captioner = load_captioner(model, **model_kwargs)
+
+
+def _on_alarm(signum, frame):
+    raise CaptionTimeout("caption timed out in worker")
+
+
+def _caption(data: bytes, max_length: int, timeout: float) -> str:
+    # The alarm frees the worker from a stuck request; the parent also gives up on its own
+    alarm = hasattr(signal, "setitimer") and timeout > 0
+    if alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _captioner.caption(data, max_length)
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ─── Web process side ───
+class CaptionEngine:
+    def __init__(self, model: str, workers: int, timeout: float, max_pending: int,
+                 max_length: int = 40, num_threads: int = 1, model_kwargs: dict | None = None):
+        self.model = model
+        self.model_kwargs = model_kwargs or {}
+        self.workers = workers
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self.max_length = max_length
+        self.num_threads = num_threads
+
+        self._pool: ProcessPoolExecutor | None = None
+        self.pending = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.failures = 0
+        self.restarts = 0
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that already runs threads and the event loop is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model, self.model_kwargs, self.num_threads),
+        )
+
+    def start(self):
+        # Cheap: processes are only spawned on first submit
+        if self._pool is None:
+            self._pool = self._new_pool()
+
+    def warm(self):
+        # Blocking: spawn every worker and load its model now instead of on the first request
+        self.start()
+        pids = {f.result() for f in [self._pool.submit(_ping) for _ in range(self.workers)]}
+        print(f"✅ Caption engine ready: {self.model} x{len(pids)} workers")
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _restart(self):
+        self.restarts += 1
+        old, self._pool = self._pool, self._new_pool()
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future: asyncio.Future):
+        # Runs when the worker is really done (or the job was cancelled before it started)
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()  # retrieved here, so an abandoned job doesn't log "never retrieved"
+
+    async def caption(self, data: bytes, max_length: int | None = None) -> str:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise CaptionBusy("caption queue is full")
+        if self._pool is None:
+            self._pool = self._new_pool()
+
+        try:
+            future = self._pool.submit(_caption, data, max_length or self.max_length, self.timeout)
+        except BrokenProcessPool as e:
+            self.failures += 1
+            self._restart()
+            raise CaptionError("caption worker crashed") from e
+
+        # pending counts jobs the pool still holds, so it stays up after we stop waiting
+        self.pending += 1
+        job = asyncio.wrap_future(future)
+        job.add_done_callback(self._release)
+        try:
+            # A little slack over the worker's own alarm, which covers queue time
+            caption = await asyncio.wait_for(asyncio.shield(job), self.timeout * 2)
+        except (asyncio.TimeoutError, CaptionTimeout):
+            self.timeouts += 1
+            future.cancel()  # only succeeds while still queued
+            raise CaptionTimeout(f"caption did not finish within {self.timeout:g}s")
+        except BrokenProcessPool as e:
+            # A worker died (OOM, segfault in native code); replace the whole pool
+            self.failures += 1
+            self._restart()
+            raise CaptionError("caption worker crashed") from e
+        except Exception as e:
+            self.failures += 1
+            raise CaptionError(str(e)) from e
+
+        self.completed += 1
+        return caption
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model,
+            "workers": self.workers,
+            "running": self._pool is not None,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "restarts": self.restarts,
+        }
+
+
+caption_engine = CaptionEngine(
+    model=settings.captioner_model,
+    workers=settings.captioner_workers,
+    timeout=settings.captioner_timeout_seconds,
+    max_pending=settings.captioner_max_pending,
+    max_length=settings.captioner_max_length,
+    num_threads=settings.captioner_threads_per_worker,
+    model_kwargs={"model_path": settings.captioner_model_path, "num_threads": settings.captioner_threads_per_worker}
+    if settings.captioner_model == "blip" else {},
+)
@@ -1,3 +1,16 @@
 # agrogpt_captioner/image_captioner.py
+from utils.config import settings
+
+_captioner = None
+
+
 def caption_image(image_path, max_length=40):
-    return "Image received. Advanced analysis will be enabled in production."
+    # In-process, for scripts; the web app goes through engine.caption_engine
+    global _captioner
+    if _captioner is None:
+        from .models import load_captioner
+
+        kwargs = {"model_path": settings.captioner_model_path} if settings.captioner_model == "blip" else {}
+        _captioner = load_captioner(settings.captioner_model, **kwargs)
+    with open(image_path, "rb") as f:
+        return _captioner.caption(f.read(), max_length)
@@ -0,0 +1,64 @@
+# agrogpt_captioner/models.py
+import io
+import time
+
+from PIL import Image
+
+DEFAULT_BLIP = "Salesforce/blip-image-captioning-base"
+
+
+def open_image(data: bytes, size: tuple[int, int]) -> Image.Image:
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", size)  # JPEG: let libjpeg downscale while decoding
+    return img.convert("RGB")
+
+
+class StubCaptioner:
+    """CPU-only stand-in with no model weights; captions from the image's colours."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+
+    def caption(self, data: bytes, max_length: int = 40) -> str:
+        img = open_image(data, (64, 64)).resize((32, 32))
+        r, g, b = (sum(band) / len(band) for band in zip(*img.getdata()))
+        if self.delay:
+            time.sleep(self.delay)
+
+        if g >= r and g >= b:
+            tone = "green"
+        elif r >= b:
+            tone = "brown" if g > b else "red"
+        else:
+            tone = "blue"
+        return f"a photo of a mostly {tone} plant"[:max_length]
+
+
+class BlipCaptioner:
+    def __init__(self, model_path: str = DEFAULT_BLIP, num_threads: int = 1):
+        import torch
+        from transformers import BlipForConditionalGeneration, BlipProcessor
+
+        torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.processor = BlipProcessor.from_pretrained(model_path)
+        self.model = BlipForConditionalGeneration.from_pretrained(model_path).eval()
+
+    def caption(self, data: bytes, max_length: int = 40) -> str:
+        img = open_image(data, (384, 384))
+        inputs = self.processor(images=img, return_tensors="pt")
+        with self.torch.inference_mode():
+            out = self.model.generate(**inputs, max_new_tokens=max_length)
+        return self.processor.decode(out[0], skip_special_tokens=True)
+
+
+CAPTIONERS = {
+    "stub": StubCaptioner,
+    "blip": BlipCaptioner,
+}
+
+
+def load_captioner(name: str, **kwargs):
+    if name not in CAPTIONERS:
+        raise ValueError(f"Unknown captioner {name!r}; expected one of {sorted(CAPTIONERS)}")
+    return CAPTIONERS[name](**kwargs)
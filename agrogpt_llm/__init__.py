@@ -0,0 +1,2 @@
+# Submodules import numpy; import them directly (agrogpt_llm.engine, .loader, .model)
+# so the app only pays for them when chat generation is enabled.
@@ -0,0 +1,351 @@
+# agrogpt_llm/engine.py
+"""Continuous-batching text generation on CPU.
+
+One scheduler task owns the model. Every step it builds a ragged batch from
+all in-flight sequences: one token for each sequence that is decoding, plus
+prompt chunks for newly admitted ones up to ``max_batch_tokens``, and runs a
+single forward pass for all of them on a worker thread. Sequences join as
+soon as a slot is free and leave the moment they finish or their client goes
+away, instead of waiting for the whole batch to drain.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.config import settings
+
+from .model import DecoderModel
+from .tokenizer import format_chat, load_tokenizer, read_json
+
+
+class GenerationError(Exception):
+    pass
+
+
+class GenerationBusy(GenerationError):
+    pass
+
+
+def sample(logits: np.ndarray, temperature: float, top_p: float, rng: np.random.Generator) -> int:
+    if temperature <= 0:
+        return int(np.argmax(logits))
+    logits = logits.astype(np.float64) / temperature
+    probs = np.exp(logits - logits.max())
+    probs /= probs.sum()
+    if top_p < 1.0:
+        # Smallest set of most likely tokens whose mass reaches top_p
+        order = np.argsort(-probs)
+        keep = order[:int(np.searchsorted(np.cumsum(probs[order]), top_p)) + 1]
+        return int(rng.choice(keep, p=probs[keep] / probs[keep].sum()))
+    return int(rng.choice(len(probs), p=probs))
+
+
+class Generation:
+    """Handle for one request: ``async for piece in generation`` yields text as it is produced."""
+
+    def __init__(self, prompt_ids: list[int], max_new_tokens: int, temperature: float, top_p: float, seed: int | None):
+        self.tokens = list(prompt_ids)
+        self.prompt_tokens = len(prompt_ids)
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+        self.rng = np.random.default_rng(seed)
+
+        self.cache = None  # allocated on admission
+        self.generated: list[int] = []
+        self.text = ""
+        self.finish_reason: str | None = None  # "stop", "length", "cancelled" or "error"
+        self.cancelled = False
+        self.submitted = time.perf_counter()
+        self.first_token_at: float | None = None
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    @property
+    def completion_tokens(self) -> int:
+        return len(self.generated)
+
+    def cancel(self):
+        # The scheduler drops the sequence (and frees its KV cache) before the next step
+        if self.finish_reason is None:
+            self.cancelled = True
+
+    def _push(self, item):
+        self._queue.put_nowait(item)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        item = await self._queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+
+class GenerationEngine:
+    def __init__(self, model_dir: str, max_batch_size: int = 8, max_batch_tokens: int = 256, max_pending: int = 32,
+                 max_context: int = 2048, max_new_tokens: int = 256, temperature: float = 0.7, top_p: float = 0.9,
+                 f32_dir: str | None = None):
+        self.model_dir = model_dir
+        self.f32_dir = f32_dir
+        self.max_batch_size = max(1, max_batch_size)
+        # Every decoding sequence needs one token of the budget
+        self.max_batch_tokens = max(self.max_batch_size, max_batch_tokens)
+        self.max_pending = max_pending
+        self.max_context = max_context
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.top_p = top_p
+
+        self.model: DecoderModel | None = None
+        self.tokenizer = None
+        self.tokenizer_config: dict = {}
+        self.stop_ids: set[int] = set()
+        self.state = "idle"  # idle → loading → ready | failed
+        self._load_lock = threading.Lock()
+
+        self._waiting: deque[Generation] = deque()
+        self._running: list[Generation] = []
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+
+        self.steps = 0
+        self.step_sequences = 0
+        self.step_seconds = 0.0
+        self.prompt_tokens = 0
+        self.generated_tokens = 0
+        self.ttft_seconds = 0.0
+        self.first_tokens = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.failures = 0
+
+    # ─── Loading ───
+    def load(self):
+        # Blocking; safe to call from several threads, loads once
+        if self.model is not None:
+            return
+        with self._load_lock:
+            if self.model is not None:
+                return
+            self.state = "loading"
+            started = time.perf_counter()
+            try:
+                model = DecoderModel.from_dir(self.model_dir, self.f32_dir)
+                self.tokenizer = load_tokenizer(self.model_dir)
+                self.tokenizer_config = read_json(self.model_dir, "tokenizer_config.json")
+            except Exception:
+                self.state = "failed"
+                raise
+
+            eos = read_json(self.model_dir, "generation_config.json").get("eos_token_id")
+            self.stop_ids = set(model.config.eos_token_ids)
+            self.stop_ids.update(eos if isinstance(eos, list) else [eos] if eos is not None else [])
+            im_end = self.tokenizer.token_to_id("<|im_end|>")
+            if im_end is not None:
+                self.stop_ids.add(im_end)
+
+            self.max_context = min(self.max_context, model.config.max_position_embeddings)
+            self.model = model
+            self.state = "ready"
+            print(f"✅ Chat model loaded from {self.model_dir} ({model.config.model_type}, "
+                  f"{model.config.num_layers} layers) in {time.perf_counter() - started:.2f}s")
+
+    async def ensure_loaded(self):
+        if self.model is None:
+            await asyncio.to_thread(self.load)
+
+    # ─── Requests ───
+    def submit(self, messages: list[dict], max_new_tokens: int | None = None, temperature: float | None = None,
+               top_p: float | None = None, seed: int | None = None) -> Generation:
+        if self.model is None:
+            raise GenerationError("chat model is not loaded")
+        if len(self._waiting) + len(self._running) >= self.max_pending:
+            self.rejected += 1
+            raise GenerationBusy("generation queue is full")
+
+        prompt_ids = self.tokenizer.encode(format_chat(messages, self.tokenizer_config))
+        max_new_tokens = min(max_new_tokens or self.max_new_tokens, self.max_new_tokens)
+        if len(prompt_ids) + max_new_tokens > self.max_context:
+            max_new_tokens = self.max_context - len(prompt_ids)
+            if max_new_tokens < 1:
+                raise ValueError(f"Prompt is too long ({len(prompt_ids)} tokens, limit {self.max_context - 1})")
+
+        generation = Generation(
+            prompt_ids, max_new_tokens,
+            self.temperature if temperature is None else temperature,
+            self.top_p if top_p is None else top_p,
+            seed,
+        )
+        self._ensure_started()
+        self._waiting.append(generation)
+        self._wakeup.set()
+        return generation
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for generation in [*self._running, *self._waiting]:
+            self._finish(generation, "cancelled", GenerationError("server is shutting down"))
+        self._running.clear()
+        self._waiting.clear()
+
+    # ─── Scheduler ───
+    def _finish(self, generation: Generation, reason: str, error: Exception | None = None):
+        generation.finish_reason = reason
+        generation.cache = None
+        if reason == "cancelled":
+            self.cancelled += 1
+        elif reason == "error":
+            self.failures += 1
+        else:
+            self.completed += 1
+        generation._push(error)
+
+    def _admit(self):
+        # Disconnected clients free their slot (and KV cache) before the next step
+        for generation in [g for g in self._running if g.cancelled]:
+            self._running.remove(generation)
+            self._finish(generation, "cancelled")
+        while self._waiting and len(self._running) < self.max_batch_size:
+            generation = self._waiting.popleft()
+            if generation.cancelled:
+                self._finish(generation, "cancelled")
+                continue
+            try:
+                generation.cache = self.model.new_cache(generation.prompt_tokens + generation.max_new_tokens)
+            except Exception as e:
+                # e.g. MemoryError for a large KV cache: fail this request, keep scheduling the rest
+                self._finish(generation, "error", GenerationError(f"could not allocate KV cache: {e}"))
+                continue
+            self._running.append(generation)
+
+    def _plan(self) -> list[tuple[Generation, list[int]]]:
+        # Decoding sequences first, one token each, so their latency doesn't depend on new prompts;
+        # prompt prefill fills the rest of the token budget, oldest first
+        decoding = [g for g in self._running if len(g.tokens) - g.cache.length == 1]
+        plan = [(g, g.tokens[-1:]) for g in decoding]
+        budget = self.max_batch_tokens - len(plan)
+        for generation in self._running:
+            pending = len(generation.tokens) - generation.cache.length
+            if pending > 1 and budget > 0:
+                chunk = generation.tokens[generation.cache.length:generation.cache.length + budget]
+                plan.append((generation, chunk))
+                budget -= len(chunk)
+                self.prompt_tokens += len(chunk)
+        return plan
+
+    def _step(self, plan: list[tuple[Generation, list[int]]]) -> list[tuple[Generation, str, str | None]]:
+        # Worker thread: forward pass, sampling and detokenization
+        logits = self.model.forward([(ids, g.cache) for g, ids in plan])
+        produced = []
+        for (generation, _), row in zip(plan, logits):
+            if generation.cache.length < len(generation.tokens):
+                continue  # prompt only partly prefilled; nothing to sample yet
+            token = sample(row, generation.temperature, generation.top_p, generation.rng)
+            if generation.first_token_at is None:
+                generation.first_token_at = time.perf_counter()
+                self.ttft_seconds += generation.first_token_at - generation.submitted
+                self.first_tokens += 1
+
+            finish_reason = None
+            if token in self.stop_ids:
+                finish_reason = "stop"
+            else:
+                generation.tokens.append(token)
+                generation.generated.append(token)
+                self.generated_tokens += 1
+                if len(generation.generated) >= generation.max_new_tokens:
+                    finish_reason = "length"
+
+            text = self.tokenizer.decode(generation.generated)
+            piece = ""
+            # Hold back a trailing partial UTF-8 character until the rest of it arrives (or we finish)
+            if (finish_reason or not text.endswith("\ufffd")) and text.startswith(generation.text):
+                piece, generation.text = text[len(generation.text):], text
+            produced.append((generation, piece, finish_reason))
+        return produced
+
+    async def _run(self):
+        while True:
+            if not self._running and not self._waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            try:
+                await self._iterate()
+            except Exception as e:
+                # Caches of in-flight sequences may be half-updated; fail them and carry on,
+                # so queued and future requests don't hang on a dead scheduler
+                print(f"❌ Generation step failed: {e}")
+                for generation in self._running:
+                    self._finish(generation, "error", GenerationError(str(e)))
+                self._running.clear()
+
+    async def _iterate(self):
+        self._admit()
+        plan = self._plan()
+        if not plan:
+            return
+
+        started = time.perf_counter()
+        try:
+            produced = await asyncio.to_thread(self._step, plan)
+        finally:
+            self.step_seconds += time.perf_counter() - started
+
+        self.steps += 1
+        self.step_sequences += len(plan)
+
+        for generation, piece, finish_reason in produced:
+            if piece:
+                generation._push(piece)
+            if finish_reason is not None:
+                self._running.remove(generation)
+                self._finish(generation, finish_reason)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "model_dir": self.model_dir,
+            "running": len(self._running),
+            "waiting": len(self._waiting),
+            "max_batch_size": self.max_batch_size,
+            "max_batch_tokens": self.max_batch_tokens,
+            "max_pending": self.max_pending,
+            "kv_cache_mb": round(sum(g.cache.nbytes for g in self._running if g.cache is not None) / 2**20, 2),
+            "steps": self.steps,
+            "avg_batch_size": round(self.step_sequences / self.steps, 3) if self.steps else 0.0,
+            "prompt_tokens": self.prompt_tokens,
+            "generated_tokens": self.generated_tokens,
+            "tokens_per_second": round(self.generated_tokens / self.step_seconds, 2) if self.step_seconds else 0.0,
+            "avg_ttft_ms": round(self.ttft_seconds * 1000 / self.first_tokens, 3) if self.first_tokens else 0.0,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "failures": self.failures,
+        }
+
+
+generation_engine = GenerationEngine(
+    model_dir=settings.llm_model_dir,
+    max_batch_size=settings.llm_max_batch_size,
+    max_batch_tokens=settings.llm_max_batch_tokens,
+    max_pending=settings.llm_max_pending,
+    max_context=settings.llm_max_context,
+    max_new_tokens=settings.llm_max_new_tokens,
+    temperature=settings.llm_temperature,
+    top_p=settings.llm_top_p,
+    f32_dir=settings.llm_f32_dir,
+)
@@ -0,0 +1,271 @@
+# agrogpt_llm/loader.py
+"""Lazy, memory-mapped access to (sharded) safetensors checkpoints.
+
+Each shard is mapped read-only with MAP_SHARED semantics, so tensor data lives
+in the OS page cache: pages are read on first touch, never copied into the
+process heap, and every uvicorn worker mapping the same file shares the same
+physical pages.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import warnings
+from collections.abc import Mapping
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock for the one-off conversion
+    fcntl = None
+
+INDEX_FILE = "model.safetensors.index.json"
+SINGLE_FILE = "model.safetensors"
+
+# numpy has no bfloat16; BF16 tensors come back as their raw uint16 bits
+DTYPES = {
+    "F64": np.float64,
+    "F32": np.float32,
+    "F16": np.float16,
+    "BF16": np.uint16,
+    "I64": np.int64,
+    "I32": np.int32,
+    "I16": np.int16,
+    "I8": np.int8,
+    "U8": np.uint8,
+    "BOOL": np.bool_,
+}
+TORCH_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+DTYPE_NAMES = {np.dtype(v): k for k, v in DTYPES.items() if k != "BF16"}
+
+
+def bf16_to_float32(bits: np.ndarray) -> np.ndarray:
+    return (bits.astype(np.uint32) << 16).view(np.float32)
+
+
+class SafetensorsShard:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            (header_size,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_size))
+        self.metadata = header.pop("__metadata__", {})
+        self.entries = header
+        self.data_offset = 8 + header_size
+        self._mmap = None
+        self._lock = threading.Lock()
+
+    def _map(self) -> mmap.mmap:
+        if self._mmap is None:
+            with self._lock:
+                if self._mmap is None:
+                    with open(self.path, "rb") as f:
+                        self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def info(self, name: str) -> tuple[str, list[int], int, int]:
+        entry = self.entries[name]
+        start, end = entry["data_offsets"]
+        return entry["dtype"], entry["shape"], self.data_offset + start, end - start
+
+    def tensor(self, name: str) -> np.ndarray:
+        dtype, shape, offset, nbytes = self.info(name)
+        np_dtype = np.dtype(DTYPES[dtype])
+        # Read-only view straight onto the mapping; no bytes are copied here
+        return np.frombuffer(self._map(), dtype=np_dtype, count=nbytes // np_dtype.itemsize, offset=offset).reshape(shape)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+class ShardedCheckpoint(Mapping):
+    """Read-only mapping of tensor name -> zero-copy numpy view.
+
+    Only ``model.safetensors.index.json`` is parsed up front; a shard's header is
+    read and the file mapped the first time one of its tensors is requested.
+    """
+
+    def __init__(self, model_dir: str):
+        self.model_dir = model_dir
+        index_path = os.path.join(model_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path) as f:
+                index = json.load(f)
+            self.weight_map = index["weight_map"]
+            self.metadata = index.get("metadata", {})
+        elif os.path.exists(os.path.join(model_dir, SINGLE_FILE)):
+            shard = SafetensorsShard(os.path.join(model_dir, SINGLE_FILE))
+            self.weight_map = {name: SINGLE_FILE for name in shard.entries}
+            self.metadata = shard.metadata
+        else:
+            raise FileNotFoundError(f"No {INDEX_FILE} or {SINGLE_FILE} in {model_dir}")
+
+        self._shards: dict[str, SafetensorsShard] = {}
+        self._lock = threading.Lock()
+        self.tensors_loaded = 0
+
+    def missing_shards(self) -> list[str]:
+        return sorted({f for f in self.weight_map.values() if not os.path.exists(os.path.join(self.model_dir, f))})
+
+    def shard(self, filename: str) -> SafetensorsShard:
+        shard = self._shards.get(filename)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(filename)
+                if shard is None:
+                    shard = SafetensorsShard(os.path.join(self.model_dir, filename))
+                    self._shards[filename] = shard
+        return shard
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        tensor = self.shard(self.weight_map[name]).tensor(name)
+        self.tensors_loaded += 1
+        return tensor
+
+    def __iter__(self):
+        return iter(self.weight_map)
+
+    def __len__(self):
+        return len(self.weight_map)
+
+    def dtype(self, name: str) -> str:
+        return self.shard(self.weight_map[name]).info(name)[0]
+
+    def to_torch(self, name: str):
+        import torch
+
+        shard = self.shard(self.weight_map[name])
+        dtype, shape, offset, nbytes = shard.info(name)
+        torch_dtype = getattr(torch, TORCH_DTYPES[dtype])
+        self.tensors_loaded += 1
+        with warnings.catch_warnings():
+            # The mapping is read-only; callers must treat the tensor as immutable
+            warnings.simplefilter("ignore", UserWarning)
+            tensor = torch.frombuffer(shard._map(), dtype=torch_dtype, count=nbytes // torch_dtype.itemsize, offset=offset)
+        return tensor.reshape(shape)
+
+    def stats(self) -> dict:
+        return {
+            "tensors": len(self.weight_map),
+            "shards": len(set(self.weight_map.values())),
+            "shards_mapped": sum(s._mmap is not None for s in self._shards.values()),
+            "tensors_loaded": self.tensors_loaded,
+        }
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.close()
+
+
+def _header_bytes(header: dict) -> bytes:
+    raw = json.dumps(header, separators=(",", ":")).encode()
+    raw += b" " * (-len(raw) % 8)  # keep tensor data 8-byte aligned
+    return struct.pack("<Q", len(raw)) + raw
+
+
+def save_safetensors(path: str, tensors: dict[str, np.ndarray], metadata: dict | None = None):
+    header = {"__metadata__": metadata} if metadata else {}
+    offset = 0
+    for name, array in tensors.items():
+        header[name] = {"dtype": DTYPE_NAMES[array.dtype], "shape": list(array.shape), "data_offsets": [offset, offset + array.nbytes]}
+        offset += array.nbytes
+    with open(path, "wb") as f:
+        f.write(_header_bytes(header))
+        for array in tensors.values():
+            f.write(np.ascontiguousarray(array).tobytes())
+
+
+HALF_DTYPES = ("BF16", "F16")
+
+
+def _as_float32(checkpoint: "ShardedCheckpoint", name: str) -> np.ndarray:
+    if checkpoint.dtype(name) == "BF16":
+        return bf16_to_float32(checkpoint[name])
+    return checkpoint[name].astype(np.float32)
+
+
+def _convert_shard(checkpoint: "ShardedCheckpoint", names: list[str], path: str):
+    # One tensor in memory at a time; the header is known up front from shapes and dtypes
+    header = {}
+    offset = 0
+    for name in names:
+        dtype, shape, _, nbytes = checkpoint.shard(checkpoint.weight_map[name]).info(name)
+        if dtype in HALF_DTYPES:
+            dtype, nbytes = "F32", nbytes * 2
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + nbytes]}
+        offset += nbytes
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_header_bytes(header))
+        for name in names:
+            array = _as_float32(checkpoint, name) if checkpoint.dtype(name) in HALF_DTYPES else checkpoint[name]
+            f.write(np.ascontiguousarray(array).data)
+    os.replace(tmp, path)
+
+
+def convert_to_float32(model_dir: str, out_dir: str) -> str:
+    """Write a copy of the checkpoint with BF16/F16 tensors widened to F32; returns ``out_dir``.
+
+    Done once on disk so every worker can map the F32 copy (and share its page
+    cache) instead of each converting the weights into private heap memory.
+    The index is written last, so its presence marks a finished conversion.
+    """
+    checkpoint = ShardedCheckpoint(model_dir)
+    source = {f: os.path.getsize(os.path.join(model_dir, f)) for f in sorted(set(checkpoint.weight_map.values()))}
+    index_path = os.path.join(out_dir, INDEX_FILE)
+
+    def up_to_date() -> bool:
+        if not os.path.exists(index_path):
+            return False
+        with open(index_path) as f:
+            return json.load(f).get("metadata", {}).get("converted_from") == source
+
+    if up_to_date():
+        checkpoint.close()
+        return out_dir
+
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, ".convert.lock"), "w") as lock:
+        if fcntl is not None:
+            # Several uvicorn workers may start at once; one converts, the rest wait for it
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not up_to_date():
+                print(f"🔄 Converting {model_dir} to float32 in {out_dir} (once)...")
+                for filename in source:
+                    names = [n for n, f in checkpoint.weight_map.items() if f == filename]
+                    _convert_shard(checkpoint, names, os.path.join(out_dir, filename))
+                with open(index_path + ".tmp", "w") as f:
+                    json.dump({"metadata": {"converted_from": source}, "weight_map": checkpoint.weight_map}, f)
+                os.replace(index_path + ".tmp", index_path)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            checkpoint.close()
+    return out_dir
+
+
+def read_rss() -> dict:
+    # Linux only: RSS split into anonymous (private heap) and file-backed (shareable) pages
+    usage = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "RssAnon", "RssFile"):
+                    usage[key] = int(value.split()[0]) * 1024
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    usage["Pss"] = int(line.split()[1]) * 1024
+    except FileNotFoundError:
+        pass
+    return usage
@@ -0,0 +1,207 @@
+# agrogpt_llm/model.py
+"""NumPy forward pass for Llama-family decoders (llama, mistral, qwen2) on CPU.
+
+``DecoderModel.forward`` takes a ragged batch: any number of sequences, each
+contributing one or more new tokens (a prompt chunk being prefilled, or the
+single token it is decoding). Projections and the MLP run once over all new
+tokens stacked together, so every weight matrix is read once per step no
+matter how many sequences are in flight; only attention is per sequence,
+against that sequence's own KV cache.
+"""
+import json
+import os
+
+import numpy as np
+
+from .loader import HALF_DTYPES, ShardedCheckpoint, bf16_to_float32, convert_to_float32
+
+SUPPORTED_MODEL_TYPES = ("llama", "mistral", "qwen2")
+
+
+class ModelConfig:
+    def __init__(self, config: dict):
+        model_type = config.get("model_type", "llama")
+        if model_type not in SUPPORTED_MODEL_TYPES:
+            raise ValueError(f"Unsupported model_type {model_type!r}; expected one of {', '.join(SUPPORTED_MODEL_TYPES)}")
+        if config.get("hidden_act", "silu") != "silu":
+            raise ValueError(f"Unsupported hidden_act {config['hidden_act']!r}")
+        # Both change the attention math; the forward pass below implements neither
+        if config.get("rope_scaling") is not None:
+            raise ValueError(f"Unsupported rope_scaling {config['rope_scaling']!r}")
+        if config.get("use_sliding_window", model_type == "mistral" and config.get("sliding_window") is not None):
+            raise ValueError(f"Unsupported sliding-window attention (sliding_window={config.get('sliding_window')!r})")
+
+        self.raw = config
+        self.model_type = model_type
+        self.vocab_size = config["vocab_size"]
+        self.hidden_size = config["hidden_size"]
+        self.intermediate_size = config["intermediate_size"]
+        self.num_layers = config["num_hidden_layers"]
+        self.num_heads = config["num_attention_heads"]
+        self.num_kv_heads = config.get("num_key_value_heads") or self.num_heads
+        self.head_dim = config.get("head_dim") or self.hidden_size // self.num_heads
+        self.rms_norm_eps = config.get("rms_norm_eps", 1e-6)
+        self.rope_theta = config.get("rope_theta", 10000.0)
+        self.max_position_embeddings = config.get("max_position_embeddings", 2048)
+        self.tie_word_embeddings = config.get("tie_word_embeddings", False)
+        # Qwen2 always has q/k/v biases; Llama exposes it as a flag
+        self.attention_bias = model_type == "qwen2" or config.get("attention_bias", False)
+
+        eos = config.get("eos_token_id")
+        self.eos_token_ids = set(eos if isinstance(eos, list) else [eos] if eos is not None else [])
+
+    @classmethod
+    def from_dir(cls, model_dir: str) -> "ModelConfig":
+        with open(os.path.join(model_dir, "config.json")) as f:
+            return cls(json.load(f))
+
+
+def as_float32(checkpoint: ShardedCheckpoint, name: str) -> np.ndarray:
+    array = checkpoint[name]
+    dtype = checkpoint.dtype(name)
+    if dtype == "F32":
+        return array  # zero-copy view onto the mapped shard
+    # Private copy per process; from_dir avoids this by converting 16-bit checkpoints on disk first
+    if dtype == "BF16":
+        return bf16_to_float32(array)
+    return array.astype(np.float32)
+
+
+def rms_norm(x: np.ndarray, weight: np.ndarray, eps: float) -> np.ndarray:
+    return x / np.sqrt(np.mean(x * x, axis=-1, keepdims=True) + eps) * weight
+
+
+def silu(x: np.ndarray) -> np.ndarray:
+    return x / (1.0 + np.exp(-x))
+
+
+class KVCache:
+    """Keys/values for one sequence, preallocated for its whole token budget."""
+
+    def __init__(self, config: ModelConfig, capacity: int):
+        shape = (config.num_layers, config.num_kv_heads, capacity, config.head_dim)
+        self.k = np.zeros(shape, dtype=np.float32)
+        self.v = np.zeros(shape, dtype=np.float32)
+        self.capacity = capacity
+        self.length = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.k.nbytes + self.v.nbytes
+
+
+class Layer:
+    __slots__ = ("input_norm", "post_norm", "q", "k", "v", "o", "q_bias", "k_bias", "v_bias", "gate", "up", "down")
+
+
+class DecoderModel:
+    def __init__(self, config: ModelConfig, checkpoint: ShardedCheckpoint):
+        self.config = config
+        self.checkpoint = checkpoint
+
+        self.embed = as_float32(checkpoint, "model.embed_tokens.weight")
+        self.norm = as_float32(checkpoint, "model.norm.weight")
+        if config.tie_word_embeddings or "lm_head.weight" not in checkpoint:
+            self.lm_head = self.embed
+        else:
+            self.lm_head = as_float32(checkpoint, "lm_head.weight")
+
+        self.layers = []
+        for i in range(config.num_layers):
+            prefix = f"model.layers.{i}."
+            layer = Layer()
+            layer.input_norm = as_float32(checkpoint, prefix + "input_layernorm.weight")
+            layer.post_norm = as_float32(checkpoint, prefix + "post_attention_layernorm.weight")
+            for proj in ("q", "k", "v", "o"):
+                setattr(layer, proj, as_float32(checkpoint, f"{prefix}self_attn.{proj}_proj.weight"))
+            for proj in ("q", "k", "v"):
+                name = f"{prefix}self_attn.{proj}_proj.bias"
+                setattr(layer, f"{proj}_bias", as_float32(checkpoint, name) if name in checkpoint else None)
+            layer.gate = as_float32(checkpoint, prefix + "mlp.gate_proj.weight")
+            layer.up = as_float32(checkpoint, prefix + "mlp.up_proj.weight")
+            layer.down = as_float32(checkpoint, prefix + "mlp.down_proj.weight")
+            self.layers.append(layer)
+
+        half = config.head_dim // 2
+        self.inv_freq = 1.0 / (config.rope_theta ** (np.arange(half, dtype=np.float64) / half))
+
+    @classmethod
+    def from_dir(cls, model_dir: str, f32_dir: str | None = None) -> "DecoderModel":
+        """Load from ``model_dir``; BF16/F16 weights are mapped from a one-off F32 copy (default ``<model_dir>/f32``)."""
+        checkpoint = ShardedCheckpoint(model_dir)
+        if any(checkpoint.dtype(name) in HALF_DTYPES for name in checkpoint):
+            checkpoint.close()
+            checkpoint = ShardedCheckpoint(convert_to_float32(model_dir, f32_dir or os.path.join(model_dir, "f32")))
+        return cls(ModelConfig.from_dir(model_dir), checkpoint)
+
+    def new_cache(self, capacity: int) -> KVCache:
+        return KVCache(self.config, capacity)
+
+    def _rope(self, positions: np.ndarray):
+        freqs = np.outer(positions, self.inv_freq)
+        cos = np.cos(freqs).astype(np.float32)
+        sin = np.sin(freqs).astype(np.float32)
+        return cos[:, None, :], sin[:, None, :]  # broadcast over heads
+
+    @staticmethod
+    def _apply_rope(x: np.ndarray, cos: np.ndarray, sin: np.ndarray) -> np.ndarray:
+        # Hugging Face "rotate_half" layout: first half pairs with second half
+        half = x.shape[-1] // 2
+        x1, x2 = x[..., :half], x[..., half:]
+        return np.concatenate([x1 * cos - x2 * sin, x2 * cos + x1 * sin], axis=-1)
+
+    def forward(self, batch: list[tuple[list[int], KVCache]]) -> np.ndarray:
+        """Append each sequence's new tokens to its cache; returns last-token logits, one row per sequence."""
+        cfg = self.config
+        tokens = np.concatenate([np.asarray(ids, dtype=np.int64) for ids, _ in batch])
+        positions = np.concatenate([np.arange(cache.length, cache.length + len(ids)) for ids, cache in batch])
+        # Row slices of the stacked tokens that belong to each sequence
+        bounds = np.cumsum([0] + [len(ids) for ids, _ in batch])
+        cos, sin = self._rope(positions)
+
+        x = self.embed[tokens].astype(np.float32, copy=False)
+        n = len(tokens)
+        group = cfg.num_heads // cfg.num_kv_heads
+        scale = np.float32(1.0 / np.sqrt(cfg.head_dim))
+
+        for index, layer in enumerate(self.layers):
+            h = rms_norm(x, layer.input_norm, cfg.rms_norm_eps)
+            q = h @ layer.q.T
+            k = h @ layer.k.T
+            v = h @ layer.v.T
+            if layer.q_bias is not None:
+                q += layer.q_bias
+                k += layer.k_bias
+                v += layer.v_bias
+            q = self._apply_rope(q.reshape(n, cfg.num_heads, cfg.head_dim), cos, sin)
+            k = self._apply_rope(k.reshape(n, cfg.num_kv_heads, cfg.head_dim), cos, sin)
+            v = v.reshape(n, cfg.num_kv_heads, cfg.head_dim)
+
+            attn = np.empty((n, cfg.num_heads * cfg.head_dim), dtype=np.float32)
+            for (ids, cache), start, end in zip(batch, bounds[:-1], bounds[1:]):
+                past, count = cache.length, end - start
+                total = past + count
+                cache.k[index, :, past:total] = k[start:end].transpose(1, 0, 2)
+                cache.v[index, :, past:total] = v[start:end].transpose(1, 0, 2)
+
+                # (kv_heads, group, new, dim) @ (kv_heads, 1, dim, total): GQA without repeating K/V
+                qs = q[start:end].transpose(1, 0, 2).reshape(cfg.num_kv_heads, group, count, cfg.head_dim)
+                scores = qs @ cache.k[index, :, None, :total].transpose(0, 1, 3, 2) * scale
+                if count > 1:
+                    # New token i sits at position past + i and may not see later ones
+                    causal = np.arange(total)[None, :] > (past + np.arange(count))[:, None]
+                    scores[..., causal] = -np.inf
+                scores = np.exp(scores - scores.max(axis=-1, keepdims=True))
+                scores /= scores.sum(axis=-1, keepdims=True)
+                out = scores @ cache.v[index, :, None, :total]
+                attn[start:end] = out.reshape(cfg.num_heads, count, cfg.head_dim).transpose(1, 0, 2).reshape(count, -1)
+
+            x = x + attn @ layer.o.T
+            h = rms_norm(x, layer.post_norm, cfg.rms_norm_eps)
+            x = x + (silu(h @ layer.gate.T) * (h @ layer.up.T)) @ layer.down.T
+
+        for ids, cache in batch:
+            cache.length += len(ids)
+
+        last = rms_norm(x[bounds[1:] - 1], self.norm, cfg.rms_norm_eps)
+        return last @ self.lm_head.T
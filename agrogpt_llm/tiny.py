@@ -0,0 +1,139 @@
+# agrogpt_llm/tiny.py
+"""Write a tiny, randomly initialized model with the merged model's architecture.
+
+Keeps the architecture fields of ``config.json`` (model type, GQA ratio, RoPE
+theta, biases, weight tying) and shrinks the sizes, and pairs it with the byte
+tokenizer, so the generation engine and the streaming chat endpoint can be
+exercised end to end without downloading the real weights. It talks nonsense.
+
+    python -m agrogpt_llm.tiny models/tiny-llm
+    python -m agrogpt_llm.tiny models/tiny-llm --like merged_model/config.json --layers 4 --hidden 128
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from .loader import INDEX_FILE, save_safetensors
+from .tokenizer import BYTE_TOKENIZER, ByteTokenizer
+
+# Used when there is no merged_model/config.json to copy the architecture from
+DEFAULT_ARCHITECTURE = {
+    "architectures": ["Qwen2ForCausalLM"],
+    "model_type": "qwen2",
+    "hidden_act": "silu",
+    "num_attention_heads": 14,
+    "num_key_value_heads": 2,
+    "rms_norm_eps": 1e-6,
+    "rope_theta": 1000000.0,
+    "tie_word_embeddings": True,
+}
+
+ARCHITECTURE_KEYS = (
+    "architectures", "model_type", "hidden_act", "rms_norm_eps", "rope_theta", "tie_word_embeddings", "attention_bias",
+)
+
+
+def tiny_config(like: dict, layers: int, hidden: int, heads: int, max_positions: int) -> dict:
+    tokenizer = ByteTokenizer()
+    # Same query/KV head ratio as the original, scaled down
+    ratio = max(1, like.get("num_attention_heads", 1) // (like.get("num_key_value_heads") or like.get("num_attention_heads", 1)))
+    kv_heads = max(1, heads // ratio)
+    config = {key: like[key] for key in ARCHITECTURE_KEYS if key in like}
+    config.update({
+        "vocab_size": tokenizer.vocab_size,
+        "hidden_size": hidden,
+        "intermediate_size": hidden * 3,
+        "num_hidden_layers": layers,
+        "num_attention_heads": heads,
+        "num_key_value_heads": kv_heads if heads % kv_heads == 0 else heads,
+        "max_position_embeddings": max_positions,
+        "bos_token_id": tokenizer.token_to_id("<|endoftext|>"),
+        "eos_token_id": [tokenizer.token_to_id("<|im_end|>"), tokenizer.token_to_id("<|endoftext|>")],
+        "torch_dtype": "float32",
+    })
+    return config
+
+
+def random_weights(config: dict, seed: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    hidden = config["hidden_size"]
+    head_dim = hidden // config["num_attention_heads"]
+    kv = config["num_key_value_heads"] * head_dim
+    qwen2 = config.get("model_type") == "qwen2" or config.get("attention_bias", False)
+
+    def dense(rows, cols):
+        return (rng.standard_normal((rows, cols), dtype=np.float32) * 0.02).astype(np.float32)
+
+    tensors = {"model.embed_tokens.weight": dense(config["vocab_size"], hidden)}
+    for i in range(config["num_hidden_layers"]):
+        prefix = f"model.layers.{i}."
+        tensors[prefix + "input_layernorm.weight"] = np.ones(hidden, dtype=np.float32)
+        tensors[prefix + "post_attention_layernorm.weight"] = np.ones(hidden, dtype=np.float32)
+        for proj, rows in (("q", hidden), ("k", kv), ("v", kv)):
+            tensors[f"{prefix}self_attn.{proj}_proj.weight"] = dense(rows, hidden)
+            if qwen2:
+                tensors[f"{prefix}self_attn.{proj}_proj.bias"] = np.zeros(rows, dtype=np.float32)
+        tensors[prefix + "self_attn.o_proj.weight"] = dense(hidden, hidden)
+        tensors[prefix + "mlp.gate_proj.weight"] = dense(config["intermediate_size"], hidden)
+        tensors[prefix + "mlp.up_proj.weight"] = dense(config["intermediate_size"], hidden)
+        tensors[prefix + "mlp.down_proj.weight"] = dense(hidden, config["intermediate_size"])
+    tensors["model.norm.weight"] = np.ones(hidden, dtype=np.float32)
+    if not config.get("tie_word_embeddings", False):
+        tensors["lm_head.weight"] = dense(config["vocab_size"], hidden)
+    return tensors
+
+
+def write_tiny_model(model_dir: str, like: dict | None = None, layers: int = 2, hidden: int = 64,
+                     heads: int = 4, max_positions: int = 2048, seed: int = 0) -> dict:
+    config = tiny_config(like or DEFAULT_ARCHITECTURE, layers, hidden, heads, max_positions)
+    tensors = random_weights(config, seed)
+    os.makedirs(model_dir, exist_ok=True)
+
+    # Sharded like the real checkpoint: two shards plus an index
+    names = list(tensors)
+    middle = len(names) // 2
+    weight_map = {}
+    for shard, part in enumerate((names[:middle], names[middle:]), start=1):
+        filename = f"model-{shard:05d}-of-00002.safetensors"
+        save_safetensors(os.path.join(model_dir, filename), {name: tensors[name] for name in part}, {"format": "pt"})
+        weight_map.update({name: filename for name in part})
+
+    files = {
+        INDEX_FILE: {"metadata": {"total_size": sum(t.nbytes for t in tensors.values())}, "weight_map": weight_map},
+        "config.json": config,
+        "generation_config.json": {"eos_token_id": config["eos_token_id"], "temperature": 0.7, "top_p": 0.9},
+        "tokenizer_config.json": {"tokenizer_class": BYTE_TOKENIZER, "eos_token": "<|im_end|>"},
+    }
+    for name, content in files.items():
+        with open(os.path.join(model_dir, name), "w") as f:
+            json.dump(content, f, indent=2)
+    return config
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("model_dir")
+    parser.add_argument("--like", help="config.json to copy the architecture from (default: merged_model/config.json if present)")
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--hidden", type=int, default=64)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    like_path = args.like or os.path.join("merged_model", "config.json")
+    like = None
+    if os.path.exists(like_path):
+        with open(like_path) as f:
+            like = json.load(f)
+    elif args.like:
+        parser.error(f"{args.like} does not exist")
+
+    config = write_tiny_model(args.model_dir, like, args.layers, args.hidden, args.heads, seed=args.seed)
+    print(f"✅ Wrote tiny {config['model_type']} model to {args.model_dir} "
+          f"({config['num_hidden_layers']} layers, hidden {config['hidden_size']}, vocab {config['vocab_size']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# agrogpt_llm/tokenizer.py
+"""Tokenizers for the generation engine, plus chat prompt formatting.
+
+The merged model ships a Hugging Face ``tokenizer.json`` (read with the
+``tokenizers`` package, imported only when such a model is loaded). The tiny
+test model uses ``ByteTokenizer``: one id per byte plus a few ChatML specials,
+so it needs no vocabulary files at all.
+"""
+import json
+import os
+
+BYTE_TOKENIZER = "AgroByteTokenizer"
+
+
+class ByteTokenizer:
+    SPECIALS = ("<|endoftext|>", "<|im_start|>", "<|im_end|>")
+
+    def __init__(self):
+        self.special_ids = {token: i for i, token in enumerate(self.SPECIALS)}
+        self.offset = len(self.SPECIALS)
+        self.vocab_size = self.offset + 256
+
+    def token_to_id(self, token: str) -> int | None:
+        return self.special_ids.get(token)
+
+    def encode(self, text: str) -> list[int]:
+        ids = []
+        while text:
+            # Earliest special token in the remaining text, if any
+            found = min(((text.find(s), s) for s in self.SPECIALS if s in text), default=None)
+            plain, text = (text[:found[0]], text[found[0]:]) if found else (text, "")
+            ids += [b + self.offset for b in plain.encode()]
+            if found:
+                ids.append(self.special_ids[found[1]])
+                text = text[len(found[1]):]
+        return ids
+
+    def decode(self, ids: list[int], skip_special_tokens: bool = True) -> str:
+        data = bytearray()
+        for i in ids:
+            if i >= self.offset:
+                data.append(i - self.offset)
+            elif not skip_special_tokens:
+                data += self.SPECIALS[i].encode()
+        return data.decode(errors="replace")
+
+
+class HFTokenizer:
+    def __init__(self, path: str):
+        from tokenizers import Tokenizer
+
+        self._tokenizer = Tokenizer.from_file(path)
+        self.vocab_size = self._tokenizer.get_vocab_size(with_added_tokens=True)
+
+    def token_to_id(self, token: str) -> int | None:
+        return self._tokenizer.token_to_id(token)
+
+    def encode(self, text: str) -> list[int]:
+        # Chat templates already contain any BOS/special tokens the model expects
+        return self._tokenizer.encode(text, add_special_tokens=False).ids
+
+    def decode(self, ids: list[int], skip_special_tokens: bool = True) -> str:
+        return self._tokenizer.decode(ids, skip_special_tokens=skip_special_tokens)
+
+
+def read_json(model_dir: str, name: str) -> dict:
+    path = os.path.join(model_dir, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_tokenizer(model_dir: str):
+    config = read_json(model_dir, "tokenizer_config.json")
+    if config.get("tokenizer_class") == BYTE_TOKENIZER:
+        return ByteTokenizer()
+    path = os.path.join(model_dir, "tokenizer.json")
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No tokenizer.json in {model_dir}")
+    return HFTokenizer(path)
+
+
+def _special(value) -> str:
+    # tokenizer_config.json stores these either as strings or as AddedToken dicts
+    if isinstance(value, dict):
+        return value.get("content", "")
+    return value or ""
+
+
+def format_chat(messages: list[dict], tokenizer_config: dict) -> str:
+    template = tokenizer_config.get("chat_template")
+    if template:
+        try:
+            from jinja2 import Environment
+        except ImportError:
+            pass  # fall back to ChatML, which is what Qwen-style templates render anyway
+        else:
+            return Environment().from_string(template).render(
+                messages=messages, add_generation_prompt=True,
+                bos_token=_special(tokenizer_config.get("bos_token")), eos_token=_special(tokenizer_config.get("eos_token")),
+            )
+    prompt = "".join(f"<|im_start|>{m['role']}\n{m['content']}<|im_end|>\n" for m in messages)
+    return prompt + "<|im_start|>assistant\n"
@@ -0,0 +1,115 @@
+"""Load-test chat endpoints against an in-process Mongo stand-in with simulated latency.
+
+Compares the async repositories with the old pattern of blocking pymongo calls,
+both inside ``async def`` handlers (stalls the event loop) and in plain ``def``
+handlers (bounded by the 40-thread threadpool).
+
+    python -m benchmarks.bench_db_concurrency --requests 400 --concurrency 100 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks.fake_mongo import FakeAsyncCollection, FakeSyncCollection, Store
+
+
+def seed(store: Store, email: str, count: int):
+    for i in range(count):
+        store.insert({"email": email, "title": "Seed", "message": f"m{i}", "response": f"r{i}", "timestamp": datetime(2024, 1, 1, 0, 0, i % 60)})
+
+
+def bench_app(latency: float) -> FastAPI:
+    from database.repositories import ChatsRepository
+
+    store = Store()
+    seed(store, "farmer@example.com", 20)
+    sync_chats = FakeSyncCollection(latency, store)
+    chats_repo = ChatsRepository(FakeAsyncCollection(latency, store))
+    app = FastAPI()
+
+    @app.get("/async-blocking/{email}")
+    async def async_blocking(email: str):
+        # The pre-repository pattern in `predict`: sync driver call inside async def
+        return {"chats": list(sync_chats.find({"email": email}, {"_id": 0}).sort("timestamp", 1))}
+
+    @app.get("/threadpool/{email}")
+    def threadpool(email: str):
+        return {"chats": list(sync_chats.find({"email": email}, {"_id": 0}).sort("timestamp", 1))}
+
+    @app.get("/async-repo/{email}")
+    async def async_repo(email: str):
+        return {"chats": await chats_repo.list_for_email(email)}
+
+    return app
+
+
+def main_app(latency: float) -> FastAPI:
+    import main
+    from database.repositories import chats_repo
+
+    chats_repo.collection = FakeAsyncCollection(latency)
+    seed(chats_repo.collection.store, "farmer@example.com", 20)
+    return main.app
+
+
+async def drive(app: FastAPI, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "req_per_s": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def run(args):
+    latency = args.latency_ms / 1000
+    bench = bench_app(latency)
+
+    scenarios = [
+        ("sync driver in async def", bench, "/async-blocking/farmer@example.com"),
+        ("sync driver in threadpool", bench, "/threadpool/farmer@example.com"),
+        ("async repository", bench, "/async-repo/farmer@example.com"),
+        ("async repository (main app)", main_app(latency), "/api/chats/farmer@example.com"),
+    ]
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {args.latency_ms} ms per DB round trip")
+    print(f"{'scenario':<30}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, app, path in scenarios:
+        result = await drive(app, path, args.requests, args.concurrency)
+        print(f"{name:<30}{result['req_per_s']:>10.1f}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Throughput and time-to-first-token of the generation engine: continuous batching vs one at a time.
+
+Writes a randomly initialized model with the merged model's architecture (see
+``agrogpt_llm.tiny``) unless ``--model-dir`` is given, then fires
+``--requests`` concurrent chat prompts at a ``GenerationEngine`` once with
+``max_batch_size=1`` (the sequential ``generate()`` baseline) and once per
+``--batch-sizes`` value, and reports tokens/s and TTFT percentiles.
+
+    python -m benchmarks.bench_generation
+    python -m benchmarks.bench_generation --hidden 512 --layers 8 --requests 32 --batch-sizes 4,8,16
+    python -m benchmarks.bench_generation --model-dir merged_model --requests 8 --max-new-tokens 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+from agrogpt_llm.engine import GenerationEngine
+from agrogpt_llm.tiny import write_tiny_model
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run(model_dir: str, batch_size: int, args) -> dict:
+    engine = GenerationEngine(model_dir, max_batch_size=batch_size, max_batch_tokens=args.max_batch_tokens,
+                              max_pending=args.requests, max_new_tokens=args.max_new_tokens)
+    await engine.ensure_loaded()
+
+    async def one(i: int) -> tuple[float, int]:
+        messages = [{"role": "user", "content": f"Question {i}: how should I treat leaf rust on wheat this season?"}]
+        # temperature 0 and no stop: every request generates exactly max_new_tokens
+        generation = engine.submit(messages, temperature=0.0)
+        started = time.perf_counter()
+        first = None
+        async for _ in generation:
+            if first is None:
+                first = time.perf_counter() - started
+        return first if first is not None else time.perf_counter() - started, generation.completion_tokens
+
+    engine.stop_ids.clear()
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    engine.stop()
+
+    ttft = sorted(r[0] for r in results)
+    tokens = sum(r[1] for r in results)
+    stats = engine.stats()
+    return {
+        "max_batch_size": batch_size,
+        "requests": args.requests,
+        "tokens": tokens,
+        "seconds": round(elapsed, 3),
+        "tokens_per_s": round(tokens / elapsed, 1),
+        "ttft_p50_ms": round(percentile(ttft, 50) * 1000, 1),
+        "ttft_p95_ms": round(percentile(ttft, 95) * 1000, 1),
+        "avg_batch_size": stats["avg_batch_size"],
+        "steps": stats["steps"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir")
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--hidden", type=int, default=256)
+    parser.add_argument("--heads", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--max-batch-tokens", type=int, default=256)
+    parser.add_argument("--batch-sizes", default="8", type=lambda s: [int(x) for x in s.split(",") if x.strip()])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = tmp
+            like_path = os.path.join("merged_model", "config.json")
+            like = None
+            if os.path.exists(like_path):
+                with open(like_path) as f:
+                    like = json.load(f)
+            write_tiny_model(model_dir, like, args.layers, args.hidden, args.heads)
+
+        for batch_size in [1, *args.batch_sizes]:
+            print(json.dumps(asyncio.run(run(model_dir, batch_size, args))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Login throughput during a burst, with and without the bounded password pool.
+
+Each scenario fires ``--requests`` logins at ``--concurrency`` while a probe hits
+``/healthz`` every 10 ms; the probe's latency shows how much the burst hurts
+cheap endpoints on the same worker.
+
+    python -m benchmarks.bench_login --requests 200 --concurrency 50 --rounds 10
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+
+import httpx
+import pyotp
+from fastapi import Body, FastAPI
+from passlib.hash import bcrypt
+
+from benchmarks.fake_mongo import FakeAsyncCollection
+
+EMAIL = "farmer@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def legacy_app(user: dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/healthz")
+    def health_check():
+        return {"status": "ok"}
+
+    @app.post("/inline")
+    async def inline(data: dict = Body(...)):
+        # bcrypt straight on the event loop
+        ok = bcrypt.verify(data["password"], user["password"]) and pyotp.TOTP(user["totp_secret"]).verify(data["code"])
+        return {"status": "success" if ok else "error"}
+
+    @app.post("/threadpool")
+    def threadpool(data: dict = Body(...)):
+        # The original `def verify_login`: unbounded use of the shared 40-thread pool
+        ok = bcrypt.verify(data["password"], user["password"]) and pyotp.TOTP(user["totp_secret"]).verify(data["code"])
+        return {"status": "success" if ok else "error"}
+
+    return app
+
+
+def pooled_app(user: dict) -> FastAPI:
+    import main
+    from database.repositories import users_repo
+
+    users_repo.collection = FakeAsyncCollection()
+    users_repo.collection.store.insert(dict(user))
+    return main.app
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/healthz")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+
+
+async def burst(app: FastAPI, path: str, body: dict, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+    probe_latencies = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def one():
+            async with semaphore:
+                response = await client.post(path, json=body)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        probe_task = asyncio.create_task(probe(client, stop, probe_latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+
+    probe_latencies.sort()
+    return {
+        "logins_per_s": statuses.get(200, 0) / elapsed,
+        "rejected": statuses.get(503, 0),
+        "healthz_p95_ms": probe_latencies[int(len(probe_latencies) * 0.95) - 1] * 1000 if probe_latencies else float("nan"),
+    }
+
+
+async def run(args):
+    secret = pyotp.random_base32()
+    user = {"email": EMAIL, "password": bcrypt.using(rounds=args.rounds).hash(PASSWORD), "totp_secret": secret}
+    body = {"email": EMAIL, "password": PASSWORD, "code": pyotp.TOTP(secret).now()}
+
+    legacy = legacy_app(user)
+    scenarios = [
+        ("bcrypt on event loop", legacy, "/inline"),
+        ("shared threadpool", legacy, "/threadpool"),
+        ("bounded password pool", pooled_app(user), "/verify-totp"),
+    ]
+
+    print(f"{args.requests} logins, concurrency {args.concurrency}, bcrypt rounds {args.rounds}")
+    print(f"{'scenario':<26}{'logins/s':>10}{'503s':>7}{'healthz p95 ms':>16}")
+    for name, app, path in scenarios:
+        result = await burst(app, path, body, args.requests, args.concurrency)
+        print(f"{name:<26}{result['logins_per_s']:>10.1f}{result['rejected']:>7}{result['healthz_p95_ms']:>16.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor for the benchmark user")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
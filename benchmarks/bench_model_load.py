@@ -0,0 +1,128 @@
+"""Startup RSS and time-to-first-token for the merged model: mmap loader vs eager copy.
+
+Each mode runs in fresh worker processes that are alive at the same time, so
+the Pss column shows how much of the weights each worker actually pays for:
+with mmap the file-backed pages are shared and Pss drops towards RssFile / N,
+while an eager load duplicates every weight in each worker's anonymous memory.
+
+Without ``--model-dir`` a synthetic sharded F32 checkpoint is written to a temp
+dir; "first token" is then an embedding lookup, a matvec through every layer
+and an argmax over the tied output projection, which touches every weight once.
+
+    python -m benchmarks.bench_model_load --size-mb 256 --workers 2
+    python -m benchmarks.bench_model_load --model-dir merged_model
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from agrogpt_llm.loader import INDEX_FILE, ShardedCheckpoint, read_rss, save_safetensors
+
+HIDDEN = 1024
+VOCAB = 8192
+
+
+def write_synthetic(model_dir: str, size_mb: int, shards: int):
+    layer_bytes = HIDDEN * HIDDEN * 4
+    layers = max(1, (size_mb * 1024 * 1024 - VOCAB * HIDDEN * 4) // layer_bytes)
+    rng = np.random.default_rng(0)
+    names = ["embed.weight"] + [f"layers.{i}.weight" for i in range(layers)]
+    weight_map = {}
+    per_shard = -(-len(names) // shards)
+    for s in range(shards):
+        filename = f"model-{s + 1:05d}-of-{shards:05d}.safetensors"
+        tensors = {}
+        for name in names[s * per_shard:(s + 1) * per_shard]:
+            shape = (VOCAB, HIDDEN) if name == "embed.weight" else (HIDDEN, HIDDEN)
+            tensors[name] = (rng.standard_normal(shape, dtype=np.float32) / np.sqrt(HIDDEN)).astype(np.float32)
+            weight_map[name] = filename
+        save_safetensors(os.path.join(model_dir, filename), tensors)
+    with open(os.path.join(model_dir, INDEX_FILE), "w") as f:
+        json.dump({"metadata": {}, "weight_map": weight_map}, f)
+
+
+def first_token(weights) -> int:
+    x = weights["embed.weight"][1].astype(np.float32)
+    layer = 0
+    while f"layers.{layer}.weight" in weights:
+        x = np.tanh(weights[f"layers.{layer}.weight"] @ x)
+        layer += 1
+    return int(np.argmax(weights["embed.weight"] @ x))
+
+
+def worker(model_dir: str, mode: str, barrier, results):
+    baseline = read_rss()
+    started = time.perf_counter()
+
+    checkpoint = ShardedCheckpoint(model_dir)
+    if mode == "eager":
+        weights = {name: np.array(checkpoint[name]) for name in checkpoint}
+        checkpoint.close()
+    else:
+        weights = checkpoint
+    opened = time.perf_counter() - started
+    after_open = read_rss()
+
+    if "embed.weight" in weights:
+        first_token(weights)
+    else:
+        # Real checkpoint: touch the first tensor only
+        np.asarray(weights[next(iter(weights))]).sum()
+    ttft = time.perf_counter() - started
+
+    barrier.wait()  # every worker holds its weights before we sample Pss
+    usage = read_rss()
+    barrier.wait()
+    results.put({
+        "mode": mode,
+        "open_s": round(opened, 4),
+        "first_token_s": round(ttft, 4),
+        "rss_after_open_mb": round((after_open.get("VmRSS", 0) - baseline.get("VmRSS", 0)) / 2**20, 1),
+        "rss_mb": round(usage.get("VmRSS", 0) / 2**20, 1),
+        "rss_anon_mb": round(usage.get("RssAnon", 0) / 2**20, 1),
+        "rss_file_mb": round(usage.get("RssFile", 0) / 2**20, 1),
+        "pss_mb": round(usage.get("Pss", 0) / 2**20, 1),
+    })
+
+
+def run(model_dir: str, mode: str, workers: int) -> list[dict]:
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(model_dir, mode, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model-dir")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_dir = args.model_dir
+        if model_dir is None:
+            model_dir = tmp
+            write_synthetic(model_dir, args.size_mb, args.shards)
+        size = sum(os.path.getsize(os.path.join(model_dir, f)) for f in os.listdir(model_dir) if f.endswith(".safetensors"))
+        print(f"checkpoint: {model_dir} ({size / 2**20:.0f} MB), {args.workers} workers")
+
+        for mode in ("mmap", "eager"):
+            for row in run(model_dir, mode, args.workers):
+                print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
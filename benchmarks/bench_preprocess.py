@@ -0,0 +1,68 @@
+"""Compare the legacy classifier preprocessing with binary_classification.preprocessing.
+
+    python -m benchmarks.bench_preprocess --images 16 --size 4000x3000
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from binary_classification.preprocessing import IMG_SIZE, preprocess, preprocess_batch
+
+
+def legacy_preprocess(image_bytes: bytes) -> np.ndarray:
+    # The original predict_binary path: full-resolution decode, then several copies
+    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img = img.resize(IMG_SIZE)
+    img_array = np.asarray(img, dtype="float32") / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    rng = np.random.default_rng(seed)
+    # Smooth gradient plus noise compresses like a real photo rather than pure noise
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    base = np.stack([x + 0 * y, y + 0 * x, (x + y) / 2], axis=-1)
+    pixels = np.clip(base + rng.normal(0, 12, base.shape), 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--size", default="4000x3000", help="WIDTHxHEIGHT of the synthetic JPEGs")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.split("x"))
+    print(f"Generating {args.images} JPEGs at {width}x{height}...")
+    images = [make_jpeg(width, height, seed) for seed in range(args.images)]
+
+    legacy = timed(lambda: np.concatenate([legacy_preprocess(b) for b in images]), args.repeat)
+    sequential = timed(lambda: np.stack([preprocess(b) for b in images]), args.repeat)
+    batched = timed(lambda: preprocess_batch(images), args.repeat)
+
+    drift = np.abs(np.concatenate([legacy_preprocess(b) for b in images]) - preprocess_batch(images)[0])
+
+    print(f"{'path':<28}{'total ms':>10}{'ms/image':>10}{'speedup':>9}")
+    for name, seconds in [("legacy (full decode)", legacy), ("draft decode", sequential), ("draft decode + threads", batched)]:
+        print(f"{name:<28}{seconds * 1000:>10.1f}{seconds * 1000 / len(images):>10.2f}{legacy / seconds:>8.1f}x")
+    print(f"pixel drift vs legacy: max {drift.max():.4f}, mean {drift.mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Exercise utils.model_downloader against a local HTTP server with Range support.
+
+Covers parallel downloads, resuming after a dropped connection, resuming an
+existing ``.part`` file, checksum/size rejection and re-fetching a corrupt file.
+
+    python -m benchmarks.check_downloader
+"""
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.model_downloader import DownloadError, download_all, download_file, manifest_artifacts
+
+BLOBS = {f"/shard-{i}.bin": os.urandom(3 * 1024 * 1024 + i) for i in range(4)}
+FLAKY = "/flaky.bin"
+BLOBS[FLAKY] = os.urandom(2 * 1024 * 1024)
+DELAY = 0.3
+
+
+class Handler(BaseHTTPRequestHandler):
+    flaky_hits = 0
+    range_requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        blob = BLOBS.get(self.path)
+        if blob is None:
+            self.send_error(404)
+            return
+
+        start = 0
+        match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if match:
+            Handler.range_requests += 1
+            start = int(match.group(1))
+            if start >= len(blob):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(blob) - 1}/{len(blob)}")
+        else:
+            self.send_response(200)
+        body = blob[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        time.sleep(DELAY)
+        if self.path == FLAKY and Handler.flaky_hits == 0:
+            # First attempt: send half, then drop the connection
+            Handler.flaky_hits += 1
+            self.wfile.write(body[: len(body) // 2])
+            self.wfile.flush()
+            self.connection.close()
+            return
+        self.wfile.write(body)
+
+
+def check(name: str, condition: bool):
+    print(f"{'✅' if condition else '❌'} {name}")
+    if not condition:
+        raise SystemExit(1)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shards = {name.lstrip("/"): {"url": base + name, "sha256": hashlib.sha256(blob).hexdigest(), "size": len(blob)}
+                  for name, blob in BLOBS.items() if name != FLAKY}
+        manifest = {"merged_model": {"dir": os.path.join(tmp, "model"), "files": shards}}
+
+        started = time.perf_counter()
+        download_all(manifest_artifacts(manifest), workers=4)
+        elapsed = time.perf_counter() - started
+        check("parallel shards downloaded and verified",
+              all(open(os.path.join(tmp, "model", n), "rb").read() == BLOBS["/" + n] for n in shards))
+        check(f"shards fetched concurrently ({elapsed:.2f}s for {len(shards)} x {DELAY}s)", elapsed < DELAY * len(shards))
+
+        flaky_path = os.path.join(tmp, "flaky.bin")
+        download_file(base + FLAKY, flaky_path, sha256=hashlib.sha256(BLOBS[FLAKY]).hexdigest())
+        check("dropped connection resumed with Range", open(flaky_path, "rb").read() == BLOBS[FLAKY] and Handler.range_requests >= 1)
+
+        part_path = os.path.join(tmp, "partial.bin")
+        with open(part_path + ".part", "wb") as f:
+            f.write(BLOBS["/shard-1.bin"][:1000])
+        before = Handler.range_requests
+        download_file(base + "/shard-1.bin", part_path, size=len(BLOBS["/shard-1.bin"]))
+        check("existing .part file resumed", open(part_path, "rb").read() == BLOBS["/shard-1.bin"] and Handler.range_requests == before + 1)
+
+        bad_path = os.path.join(tmp, "bad.bin")
+        try:
+            download_file(base + "/shard-2.bin", bad_path, sha256="0" * 64)
+            check("checksum mismatch rejected", False)
+        except DownloadError:
+            check("checksum mismatch rejected, nothing left behind", not os.path.exists(bad_path) and not os.path.exists(bad_path + ".part"))
+
+        corrupt_path = os.path.join(tmp, "corrupt.bin")
+        with open(corrupt_path, "wb") as f:
+            f.write(b"half-written")
+        download_file(base + "/shard-3.bin", corrupt_path, size=len(BLOBS["/shard-3.bin"]))
+        check("truncated existing file re-downloaded", open(corrupt_path, "rb").read() == BLOBS["/shard-3.bin"])
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""In-process stand-ins for MongoDB collections, used by the benchmarks.
+
+``FakeAsyncCollection`` mimics the subset of the pymongo async API the
+repositories use, with an optional per-call latency to model a network round
+trip. ``FakeSyncCollection`` wraps the same store with blocking calls, which is
+how the handlers talked to Mongo before the async repositories.
+"""
+import asyncio
+import copy
+import itertools
+import time
+
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+
+def _get(doc: dict, key: str):
+    for part in key.split("."):
+        if not isinstance(doc, dict) or part not in doc:
+            return None
+        doc = doc[part]
+    return doc
+
+
+def _compare(value, op: str, expected) -> bool:
+    if op == "$exists":
+        return (value is not None) == bool(expected)
+    if op == "$in":
+        return value in expected
+    if op == "$ne":
+        return value != expected
+    if op == "$eq":
+        return value == expected
+    if value is None:
+        return False
+    return {
+        "$lt": lambda: value < expected,
+        "$lte": lambda: value <= expected,
+        "$gt": lambda: value > expected,
+        "$gte": lambda: value >= expected,
+    }[op]()
+
+
+def matches(doc: dict, query: dict | None) -> bool:
+    for key, expected in (query or {}).items():
+        if key == "$or":
+            if not any(matches(doc, q) for q in expected):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, q) for q in expected):
+                return False
+        elif isinstance(expected, dict) and expected and all(k.startswith("$") for k in expected):
+            if not all(_compare(_get(doc, key), op, v) for op, v in expected.items()):
+                return False
+        elif _get(doc, key) != expected:
+            return False
+    return True
+
+
+def project(doc: dict, projection: dict | None) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    included = [k for k, v in projection.items() if v and k != "_id"]
+    if included:
+        keep = set(included) | ({"_id"} if projection.get("_id", 1) else set())
+        return {k: v for k, v in doc.items() if k in keep}
+    return {k: v for k, v in doc.items() if projection.get(k, 1)}
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+
+
+class UpdateResult:
+    def __init__(self, upserted_id=None):
+        self.upserted_id = upserted_id
+
+
+class BulkWriteResult:
+    def __init__(self, inserted_count: int, upserted_count: int):
+        self.inserted_count = inserted_count
+        self.upserted_count = upserted_count
+
+
+class Store:
+    def __init__(self):
+        self.docs: list[dict] = []
+        self.unique: list[tuple[list[str], dict | None]] = []
+
+    def _violates_unique(self, doc: dict) -> bool:
+        for fields, partial in self.unique:
+            if partial and not matches(doc, partial):
+                continue
+            key = [_get(doc, f) for f in fields]
+            for other in self.docs:
+                if (not partial or matches(other, partial)) and [_get(other, f) for f in fields] == key:
+                    return True
+        return False
+
+    def insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        if any(d["_id"] == doc["_id"] for d in self.docs) or self._violates_unique(doc):
+            raise DuplicateKeyError("E11000 duplicate key error", 11000)
+        self.docs.append(copy.deepcopy(doc))
+        return doc["_id"]
+
+    def insert_many(self, docs: list[dict], ordered: bool):
+        inserted, errors = [], []
+        for index, doc in enumerate(docs):
+            try:
+                inserted.append(self.insert(doc))
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return inserted
+
+    def find(self, query, projection, sort, skip, limit):
+        docs = [d for d in self.docs if matches(d, query)]
+        for key, direction in reversed(sort):
+            docs.sort(key=lambda d: (_get(d, key) is not None, _get(d, key)), reverse=direction < 0)
+        docs = docs[skip:]
+        if limit:
+            docs = docs[:limit]
+        return [project(d, projection) for d in docs]
+
+    def update_one(self, query, update, upsert):
+        for doc in self.docs:
+            if matches(doc, query):
+                doc.update(copy.deepcopy(update.get("$set", {})))
+                return UpdateResult()
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$")}
+            doc.update(update.get("$set", {}))
+            doc.update(update.get("$setOnInsert", {}))
+            return UpdateResult(self.insert(doc))
+        return UpdateResult()
+
+    def bulk_write(self, ops: list, ordered: bool):
+        # InsertOne / UpdateOne only, which is all the repositories send
+        inserted = upserted = 0
+        errors = []
+        for index, op in enumerate(ops):
+            try:
+                if isinstance(op, InsertOne):
+                    self.insert(op._doc)
+                    inserted += 1
+                elif self.update_one(op._filter, op._doc, op._upsert).upserted_id is not None:
+                    upserted += 1
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000, "errmsg": "E11000 duplicate key error"})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted, "nUpserted": upserted})
+        return BulkWriteResult(inserted, upserted)
+
+    def create_index(self, keys, unique=False, partialFilterExpression=None, **kwargs):
+        if isinstance(keys, str):
+            keys = [(keys, 1)]
+        fields = [k for k, _ in keys]
+        if unique:
+            self.unique.append((fields, partialFilterExpression))
+        return "_".join(f"{k}_{d}" for k, d in keys)
+
+
+class FakeAsyncCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._batch_size = 101
+        self._results = None
+
+    def sort(self, key, direction=None):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction or 1)]
+        return self
+
+    def skip(self, n):
+        self._skip = n
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def batch_size(self, n):
+        self._batch_size = n
+        return self
+
+    def _run(self):
+        if self._results is None:
+            self._results = iter(self.collection.store.find(self.query, self.projection, self._sort, self._skip, self._limit))
+        return self._results
+
+    async def to_list(self, length=None):
+        await self.collection.round_trip()
+        return list(itertools.islice(self._run(), length))
+
+    def __aiter__(self):
+        self._fetched = 0
+        return self
+
+    async def __anext__(self):
+        # One simulated round trip per server batch
+        if self._fetched % self._batch_size == 0:
+            await self.collection.round_trip()
+        self._fetched += 1
+        try:
+            return next(self._run())
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        pass
+
+
+class FakeAsyncCollection:
+    def __init__(self, latency: float = 0.0, store: Store | None = None):
+        self.latency = latency
+        self.store = store or Store()
+
+    async def round_trip(self):
+        await asyncio.sleep(self.latency)
+
+    async def find_one(self, query=None, projection=None):
+        await self.round_trip()
+        found = self.store.find(query, projection, [], 0, 1)
+        return found[0] if found else None
+
+    def find(self, query=None, projection=None):
+        return FakeAsyncCursor(self, query, projection)
+
+    async def insert_one(self, doc):
+        await self.round_trip()
+        return InsertOneResult(self.store.insert(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        await self.round_trip()
+        return InsertManyResult(self.store.insert_many(list(docs), ordered))
+
+    async def update_one(self, query, update, upsert=False):
+        await self.round_trip()
+        return self.store.update_one(query, update, upsert)
+
+    async def bulk_write(self, ops, ordered=True):
+        await self.round_trip()
+        return self.store.bulk_write(list(ops), ordered)
+
+    async def count_documents(self, query):
+        await self.round_trip()
+        return len(self.store.find(query, None, [], 0, 0))
+
+    async def create_index(self, keys, **kwargs):
+        await self.round_trip()
+        return self.store.create_index(keys, **kwargs)
+
+
+class FakeSyncCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = []
+
+    def sort(self, key, direction=None):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction or 1)]
+        return self
+
+    def __iter__(self):
+        time.sleep(self.collection.latency)
+        return iter(self.collection.store.find(self.query, self.projection, self._sort, 0, 0))
+
+
+class FakeSyncCollection:
+    def __init__(self, latency: float = 0.0, store: Store | None = None):
+        self.latency = latency
+        self.store = store or Store()
+
+    def find_one(self, query=None, projection=None):
+        time.sleep(self.latency)
+        found = self.store.find(query, projection, [], 0, 1)
+        return found[0] if found else None
+
+    def find(self, query=None, projection=None):
+        return FakeSyncCursor(self, query, projection)
+
+    def insert_one(self, doc):
+        time.sleep(self.latency)
+        return InsertOneResult(self.store.insert(doc))
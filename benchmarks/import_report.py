@@ -0,0 +1,132 @@
+"""Import-time report for the app, and time from process start to first response.
+
+Runs ``python -X importtime -c "import main"`` a few times in fresh
+interpreters, keeps each module's best (minimum) time, and prints the
+heaviest modules by cumulative and self time plus a per-package total.
+``--first-response`` additionally starts uvicorn and measures how long until
+``/healthz`` first answers 200, which is what an autoscaler waits for.
+
+    python -m benchmarks.import_report
+    python -m benchmarks.import_report --runs 5 --top 25 --json import_report.json
+    python -m benchmarks.import_report --budget-ms 700 --first-response
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+ENV = {"MONGO_URI": "mongodb://localhost:27017", "JWT_SECRET": "import-report"}
+
+
+def child_env() -> dict:
+    env = dict(os.environ)
+    for key, value in ENV.items():
+        env.setdefault(key, value)
+    return env
+
+
+def importtime(module: str) -> dict[str, dict]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=child_env(),
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            # A module is only listed the first time it is imported
+            modules[name] = {"self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000, "depth": len(indent) // 2}
+    return modules
+
+
+def best_of(runs: list[dict[str, dict]]) -> dict[str, dict]:
+    best = {}
+    for run in runs:
+        for name, timing in run.items():
+            if name not in best:
+                best[name] = dict(timing)
+            else:
+                best[name]["self_ms"] = min(best[name]["self_ms"], timing["self_ms"])
+                best[name]["cumulative_ms"] = min(best[name]["cumulative_ms"], timing["cumulative_ms"])
+    return best
+
+
+def first_response(module: str, timeout: float = 60.0) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=child_env(),
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise SystemExit(f"no response from {module}:app within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", help="write the full per-module report here")
+    parser.add_argument("--budget-ms", type=float, help="exit non-zero when importing the module takes longer")
+    parser.add_argument("--first-response", action="store_true", help="also time uvicorn start to first /healthz 200")
+    args = parser.parse_args()
+
+    modules = best_of([importtime(args.module) for _ in range(args.runs)])
+    total = modules[args.module]["cumulative_ms"]
+
+    packages = {}
+    for name, timing in modules.items():
+        top = name.split(".")[0]
+        packages[top] = packages.get(top, 0.0) + timing["self_ms"]
+
+    print(f"import {args.module}: {total:.1f} ms (best of {args.runs})\n")
+    print(f"{'cumulative ms':>14}  direct imports of {args.module}")
+    direct = [(n, t) for n, t in modules.items() if t["depth"] == 1]
+    for name, timing in sorted(direct, key=lambda x: -x[1]["cumulative_ms"])[:args.top]:
+        print(f"{timing['cumulative_ms']:>14.1f}  {name}")
+
+    print(f"\n{'self ms':>14}  package")
+    for name, self_ms in sorted(packages.items(), key=lambda x: -x[1])[:args.top]:
+        print(f"{self_ms:>14.1f}  {name}")
+
+    report = {"module": args.module, "total_ms": total, "packages_ms": packages, "modules": modules}
+    if args.first_response:
+        report["first_response_s"] = first_response(args.module)
+        print(f"\nuvicorn start → first /healthz 200: {report['first_response_s']:.2f} s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"\n❌ import {args.module} took {total:.1f} ms, over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Load test for the API: runs ``main.app`` in-process against fake Mongo and a tiny model.
+
+Scenarios drive login (bcrypt + TOTP), chat history reads, chat writes, image
+upload and binary classification through httpx's ASGI transport at a fixed
+concurrency, and report p50/p95/p99 latency and req/s as JSON. Results can be
+saved as a baseline and later runs compared against it; a scenario regresses
+when its p95 grows or its throughput drops by more than ``--tolerance``.
+
+    python -m benchmarks.run --requests 200 --concurrency 16 --output results.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --fail-on-regression
+    python -m benchmarks.run --scenarios classify,upload --model keras
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("JWT_SECRET", "benchmark-secret")
+# Every request comes from one client; per-client rate limits would turn the load test into a limiter test
+os.environ.setdefault("RATE_LIMIT_IMAGE_PER_MINUTE", "0")
+
+import httpx
+import numpy as np
+import pyotp
+from passlib.hash import bcrypt
+from PIL import Image
+
+from benchmarks.fake_mongo import FakeAsyncCollection
+
+EMAIL = "farmer@example.com"
+PASSWORD = "correct horse battery staple"
+SCENARIOS = ("auth", "chat_read", "chat_write", "upload", "classify")
+
+
+class StubBackend:
+    # Same interface as binary_classification.backends; a little real work per image
+    name = "stub"
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        return batch.mean(axis=(1, 2, 3))
+
+
+def tiny_keras_backend(tmp: str):
+    import tensorflow as tf
+
+    from binary_classification.backends import KerasBackend
+    from binary_classification.preprocessing import IMG_SIZE
+
+    inputs = tf.keras.Input((*IMG_SIZE, 3))
+    x = tf.keras.layers.Conv2D(4, 3, strides=4, activation="relu")(inputs)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    outputs = tf.keras.layers.Dense(1, activation="sigmoid")(x)
+    path = os.path.join(tmp, "tiny.keras")
+    tf.keras.Model(inputs, outputs).save(path)
+    return KerasBackend(path)
+
+
+def jpeg(seed: int, size=(320, 240)) -> bytes:
+    pixels = np.random.default_rng(seed).integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def setup_app(args, tmp: str):
+    import main
+    from database.repositories import chats_repo, reports_repo, users_repo
+
+    latency = args.db_latency_ms / 1000
+    for repo in (users_repo, chats_repo, reports_repo):
+        repo.collection = FakeAsyncCollection(latency=latency)
+
+    async def no_indexes():
+        pass
+
+    main.create_indexes = no_indexes
+
+    secret = pyotp.random_base32()
+    users_repo.collection.store.insert({
+        "email": EMAIL,
+        "password": bcrypt.using(rounds=args.bcrypt_rounds).hash(PASSWORD),
+        "totp_secret": secret,
+    })
+    start = datetime(2024, 1, 1)
+    for i in range(args.seed_chats):
+        chats_repo.collection.store.insert({
+            "email": EMAIL, "title": f"Chat {i}", "message": "How do I treat leaf rust?" * 4,
+            "response": "Apply a fungicide and remove infected leaves." * 8, "timestamp": start + timedelta(minutes=i),
+        })
+
+    classifier = main.binary_classifier
+    if classifier is not None:
+        classifier.model = tiny_keras_backend(tmp) if args.model == "keras" else StubBackend()
+        classifier.model_version = f"bench-{args.model}"
+        classifier.warmup_state = "ready"
+    return main.app, secret
+
+
+def request_factory(name: str, secret: str, args):
+    counter = itertools.count()
+    images = [jpeg(i) for i in range(min(args.requests + args.warmup, args.distinct_images))]
+
+    if name == "auth":
+        return lambda c: c.post("/verify-totp", json={"email": EMAIL, "password": PASSWORD, "code": pyotp.TOTP(secret).now()})
+    if name == "chat_read":
+        return lambda c: c.get(f"/api/chats/{EMAIL}/page", params={"limit": 20})
+    if name == "chat_write":
+        return lambda c: c.post(f"/api/migrate-chats/{EMAIL}", json={
+            "message": "Which fertiliser for paddy?", "response": "Use urea in split doses.", "client_id": f"bench-{next(counter)}",
+        })
+    if name == "upload":
+        return lambda c: c.post("/detect-image", files={"file": ("leaf.jpg", images[next(counter) % len(images)], "image/jpeg")})
+    if name == "classify":
+        # Distinct images, so every request misses the result cache and reaches the model
+        return lambda c: c.post("/binary-classifier/predict", files={"file": ("leaf.jpg", images[next(counter) % len(images)], "image/jpeg")})
+    raise ValueError(f"Unknown scenario {name!r}")
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, make_request, requests: int, concurrency: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        await make_request(client)
+
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        # Closed loop: each worker sends its next request when the previous one returns
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await make_request(client)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    ok = sum(n for status, n in statuses.items() if status < 400)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": requests - ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "req_per_s": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else None,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    print(f"\n{'scenario':<12}{'p95 ms':>10}{'base':>10}{'Δ':>8}{'req/s':>10}{'base':>10}{'Δ':>8}")
+    for name, current in results["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            print(f"{name:<12}{'(no baseline)':>30}")
+            continue
+        p95_delta = current["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_delta = current["req_per_s"] / base["req_per_s"] - 1 if base["req_per_s"] else 0.0
+        flag = ""
+        if p95_delta > tolerance or rps_delta < -tolerance:
+            regressions.append(name)
+            flag = "  ❌"
+        print(f"{name:<12}{current['p95_ms']:>10.2f}{base['p95_ms']:>10.2f}{p95_delta:>+8.0%}"
+              f"{current['req_per_s']:>10.1f}{base['req_per_s']:>10.1f}{rps_delta:>+8.0%}{flag}")
+    return regressions
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        app, secret = setup_app(args, tmp)
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for name in args.scenarios:
+                results[name] = await run_scenario(client, request_factory(name, secret, args), args.requests, args.concurrency, args.warmup)
+                print(f"{name:<12} {json.dumps(results[name])}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "save_baseline")},
+        },
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), type=lambda s: [x.strip() for x in s.split(",") if x.strip()])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="simulated Mongo round trip")
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    parser.add_argument("--seed-chats", type=int, default=500)
+    parser.add_argument("--distinct-images", type=int, default=512)
+    parser.add_argument("--model", choices=("stub", "keras"), default="stub")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--save-baseline", help="also write results JSON as the new baseline")
+    parser.add_argument("--baseline", help="compare against this results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative p95 / req/s change")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results = asyncio.run(run(args))
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions and args.fail_on_regression:
+            print(f"Regressed: {', '.join(regressions)}", file=sys.stderr)
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Export the Keras binary classifier to TFLite and check prediction parity.
+
+    python -m binary_classification.export --quantize float16
+    python -m binary_classification.export --quantize int8 --calibration-dir samples/
+    python -m binary_classification.export --check-only --calibration-dir samples/
+"""
+import argparse
+import os
+
+import numpy as np
+
+from binary_classification.backends import KerasBackend, TFLiteBackend
+from binary_classification.preprocessing import IMG_SIZE, preprocess
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+KERAS_PATH = os.path.join(BASE_DIR, "agro_classifier_FINAL_CLEAN.keras")
+TFLITE_PATH = os.path.join(BASE_DIR, "agro_classifier_FINAL_CLEAN.tflite")
+
+THRESHOLD = 0.5
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+
+def load_samples(sample_dir: str | None, count: int) -> np.ndarray:
+    if sample_dir:
+        names = sorted(n for n in os.listdir(sample_dir) if n.lower().endswith(IMAGE_EXTENSIONS))[:count]
+        if names:
+            samples = []
+            for name in names:
+                with open(os.path.join(sample_dir, name), "rb") as f:
+                    samples.append(preprocess(f.read()))
+            return np.stack(samples)
+        print(f"⚠️ No images found in {sample_dir}, falling back to random inputs")
+
+    rng = np.random.default_rng(0)
+    return rng.random((count, *IMG_SIZE, 3), dtype=np.float32)
+
+
+def convert(keras_path: str, output_path: str, quantize: str, samples: np.ndarray):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize == "dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif quantize == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([sample[None, ...]] for sample in samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def parity_report(reference, candidate, samples: np.ndarray) -> dict:
+    expected = reference.predict(samples)
+    actual = np.concatenate([candidate.predict(samples[i:i + 1]) for i in range(len(samples))])
+    drift = np.abs(expected - actual)
+    return {
+        "samples": int(len(samples)),
+        "max_abs_diff": float(drift.max()),
+        "mean_abs_diff": float(drift.mean()),
+        "label_agreement": float(np.mean((expected < THRESHOLD) == (actual < THRESHOLD))),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keras-path", default=KERAS_PATH)
+    parser.add_argument("--output", default=TFLITE_PATH)
+    parser.add_argument("--quantize", choices=["none", "dynamic", "float16", "int8"], default="none")
+    parser.add_argument("--calibration-dir", help="Images used for int8 calibration and the parity check")
+    parser.add_argument("--samples", type=int, default=64)
+    parser.add_argument("--check-only", action="store_true", help="Skip conversion, only compare existing models")
+    args = parser.parse_args()
+
+    samples = load_samples(args.calibration_dir, args.samples)
+
+    if not args.check_only:
+        if args.quantize == "int8" and not args.calibration_dir:
+            print("⚠️ int8 calibration on random inputs; pass --calibration-dir for representative ranges")
+        print(f"🔄 Converting {args.keras_path} ({args.quantize})...")
+        convert(args.keras_path, args.output, args.quantize, samples)
+        print(f"✅ Wrote {args.output} ({os.path.getsize(args.output) / 1e6:.2f} MB)")
+
+    report = parity_report(KerasBackend(args.keras_path), TFLiteBackend(args.output), samples)
+    print("📊 Parity vs Keras:")
+    for key, value in report.items():
+        print(f"   {key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+IMG_SIZE = (224, 224)
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # PIL releases the GIL while decoding and resizing, so threads scale across cores
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="preprocess")
+    return _executor
+
+
+def decode(image_bytes: bytes) -> Image.Image:
+    img = Image.open(io.BytesIO(image_bytes))
+    # JPEG can decode at 1/2, 1/4 or 1/8 scale; pick the smallest scale still >= IMG_SIZE
+    # so a 12MP photo never materializes at full resolution.
+    if img.format == "JPEG":
+        img.draft("RGB", IMG_SIZE)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img.resize(IMG_SIZE)
+
+
+def preprocess_into(image_bytes: bytes, out: np.ndarray):
+    # Normalize straight into the caller's slot (e.g. a row of a preallocated batch)
+    np.divide(np.asarray(decode(image_bytes)), np.float32(255.0), out=out)
+
+
+def preprocess(image_bytes: bytes) -> np.ndarray:
+    out = np.empty((*IMG_SIZE, 3), dtype=np.float32)
+    preprocess_into(image_bytes, out)
+    return out
+
+
+def preprocess_batch(images: list[bytes]) -> tuple[np.ndarray, list[Exception | None]]:
+    batch = np.empty((len(images), *IMG_SIZE, 3), dtype=np.float32)
+    futures = [get_executor().submit(preprocess_into, data, batch[i]) for i, data in enumerate(images)]
+    errors = [future.exception() for future in futures]
+    return batch, errors
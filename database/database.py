@@ -1,31 +1,188 @@
-from pymongo import MongoClient
+from pymongo import AsyncMongoClient, MongoClient, monitoring
 import certifi
-import os
-from dotenv import load_dotenv
+import threading
 
-# ─── Load environment variables ───
-load_dotenv()
-MONGO_URL = os.getenv("MONGO_URL")
+from utils.config import settings
+from utils.metrics import mongo_command_latency, record_stage
 
-if not MONGO_URL:
-    raise ValueError("❌ MONGO_URL not found in .env file. Please check your configuration.")
 
-# ─── SSL/TLS Certificates ───
-ca = certifi.where()
+# ─── Connection pool instrumentation ───
+class PoolStats(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.waiting = 0
+        self.in_use = 0
+        self.open = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
 
-try:
-    # ─── Create MongoDB client ───
-    client = MongoClient(MONGO_URL, tls=True, tlsCAFile=ca)
+    def _waited(self, duration):
+        if duration is not None:
+            self.wait_seconds_total += duration
+            self.wait_seconds_max = max(self.wait_seconds_max, duration)
 
-    # ─── Access database ───
-    db = client["agrogpt"]
+    def connection_check_out_started(self, event):
+        with self.lock:
+            self.waiting += 1
 
-    # ─── Collections ───
-    users_collection = db["users"]         # Stores user info
-    reports_collection = db["reports"]     # Stores reports
-    chats_collection = db["chats"]         # Stores chat history
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.checkouts += 1
+            self._waited(event.duration)
 
-    print("✅ Connected to MongoDB successfully!")
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+            self._waited(event.duration)
 
-except Exception as e:
-    print("❌ MongoDB connection failed:", e)
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.in_use -= 1
+
+    def connection_created(self, event):
+        with self.lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.open -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            attempts = self.checkouts + self.checkout_failures
+            return {
+                "max_pool_size": settings.mongo_max_pool_size,
+                "open_connections": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": round(self.wait_seconds_total * 1000 / attempts, 3) if attempts else 0.0,
+                "max_checkout_wait_ms": round(self.wait_seconds_max * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class CommandTimings(monitoring.CommandListener):
+    # Events fire inside the task that ran the command, so they land in that request's "db" stage
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        mongo_command_latency.observe(seconds, event.command_name, outcome)
+        record_stage("db", seconds)
+
+
+command_timings = CommandTimings()
+
+
+# ─── Shared client ───
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+        "event_listeners": [pool_stats, command_timings],
+    }
+    if settings.mongo_compressors:
+        options["compressors"] = settings.mongo_compressors
+
+    tls = settings.mongo_tls
+    if tls is None:
+        # Atlas SRV URIs imply TLS
+        tls = settings.mongo_uri.startswith("mongodb+srv://")
+    if tls:
+        options["tls"] = True
+        options["tlsCAFile"] = certifi.where()
+    return options
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(settings.mongo_uri, **client_options())
+    return _client
+
+
+def get_db():
+    return get_client()[settings.mongo_db]
+
+
+_async_client = None
+
+
+def get_async_client() -> AsyncMongoClient:
+    # Bound to the event loop that first uses it (uvicorn runs one loop per worker)
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncMongoClient(settings.mongo_uri, **client_options())
+    return _async_client
+
+
+def get_async_db():
+    return get_async_client()[settings.mongo_db]
+
+
+async def close_clients():
+    # Called from the app lifespan; the next get_*client() call opens fresh ones
+    global _client, _async_client
+    with _client_lock:
+        async_client, _async_client = _async_client, None
+        client, _client = _client, None
+    if async_client is not None:
+        await async_client.close()
+    if client is not None:
+        client.close()
+
+
+# ─── Legacy module attributes ───
+def __getattr__(name):
+    # `from database.database import db` still works, but nothing connects at import time
+    if name == "client":
+        return get_client()
+    if name == "db":
+        return get_db()
+    if name in ("users_collection", "reports_collection", "chats_collection"):
+        return get_db()[name.removesuffix("_collection")]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,27 @@
+from pymongo import ASCENDING
+
+# collection -> [(keys, options)]
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"name": "email_1"}),
+        ([("phone", ASCENDING)], {"name": "phone_1"}),
+    ],
+    "chats": [
+        # Serves the full history (ascending) and keyset pages (walked backwards)
+        ([("email", ASCENDING), ("timestamp", ASCENDING), ("_id", ASCENDING)], {"name": "email_1_timestamp_1__id_1"}),
+        # Idempotent migrations; chats without a client_id are not constrained
+        (
+            [("email", ASCENDING), ("client_id", ASCENDING)],
+            {"name": "email_1_client_id_1", "unique": True, "partialFilterExpression": {"client_id": {"$exists": True}}},
+        ),
+    ],
+    "reports": [
+        ([("phone", ASCENDING)], {"name": "phone_1"}),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            await db[collection].create_index(keys, **options)
@@ -0,0 +1,138 @@
+import base64
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from database.database import get_async_db
+
+
+class LazyCollection:
+    """Stands in for ``get_async_db()[name]``, resolved on every use.
+
+    Importing the repositories therefore opens no client, and the lifespan can
+    close and reopen the client without leaving repositories on a stale one.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_async_db()[self.name], attr)
+
+
+class UsersRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def find_by_email(self, email: str):
+        return await self.collection.find_one({"email": email})
+
+    async def find_by_phone(self, phone: str):
+        return await self.collection.find_one({"phone": phone})
+
+    async def create(self, user: dict):
+        await self.collection.insert_one(user)
+
+    async def update_by_phone(self, phone: str, fields: dict):
+        await self.collection.update_one({"phone": phone}, {"$set": fields})
+
+
+class ChatsRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def list_for_email(self, email: str) -> list[dict]:
+        cursor = self.collection.find({"email": email}, {"_id": 0}).sort("timestamp", 1)
+        return await cursor.to_list(length=None)
+
+    async def page_for_email(self, email: str, limit: int, before: tuple | None = None, fields: list[str] | None = None) -> list[dict]:
+        # Keyset pagination, newest first: (timestamp, _id) strictly before the cursor
+        query = {"email": email}
+        if before is not None:
+            timestamp, last_id = before
+            query["$or"] = [
+                {"timestamp": {"$lt": timestamp}},
+                {"timestamp": timestamp, "_id": {"$lt": last_id}},
+            ]
+        projection = None
+        if fields:
+            projection = {field: 1 for field in fields}
+            projection["timestamp"] = 1
+        cursor = self.collection.find(query, projection).sort([("timestamp", -1), ("_id", -1)]).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    def iter_for_email(self, email: str, batch_size: int):
+        # Async cursor; documents arrive from the server batch_size at a time
+        return self.collection.find({"email": email}, {"_id": 0}).sort("timestamp", 1).batch_size(batch_size)
+
+    async def create(self, chat: dict):
+        await self.collection.insert_one(chat)
+
+    @staticmethod
+    def _upsert(chat: dict) -> tuple[dict, dict]:
+        # Keyed on (email, client_id), so a retry is a no-op whether or not the
+        # unique index has been built yet; the index still catches racing retries
+        key = {"email": chat["email"], "client_id": chat["client_id"]}
+        return key, {"$setOnInsert": {k: v for k, v in chat.items() if k not in key}}
+
+    async def create_once(self, chat: dict) -> bool:
+        """Insert a chat unless one with the same client_id is already stored; False if it was."""
+        if not chat.get("client_id"):
+            await self.collection.insert_one(chat)
+            return True
+        try:
+            result = await self.collection.update_one(*self._upsert(chat), upsert=True)
+        except DuplicateKeyError:
+            return False
+        return result.upserted_id is not None
+
+    async def create_many(self, chats: list[dict]) -> tuple[int, int]:
+        # Unordered: one duplicate (a retried client_id) doesn't stop the rest of the batch
+        if not chats:
+            return 0, 0
+        ops = [UpdateOne(*self._upsert(chat), upsert=True) if chat.get("client_id") else InsertOne(chat) for chat in chats]
+        try:
+            result = await self.collection.bulk_write(ops, ordered=False)
+            inserted = result.inserted_count + result.upserted_count
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            inserted = e.details.get("nInserted", 0) + e.details.get("nUpserted", 0)
+        return inserted, len(chats) - inserted
+
+
+def encode_cursor(doc: dict) -> str:
+    raw = json.dumps({"t": doc["timestamp"].isoformat(), "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid pagination cursor") from e
+
+
+class ReportsRepository:
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def list_for_phone(self, phone: str) -> list[dict]:
+        return await self.collection.find({"phone": phone}, {"_id": 0}).to_list(length=None)
+
+    def iter_for_phone(self, phone: str, batch_size: int):
+        return self.collection.find({"phone": phone}, {"_id": 0}).batch_size(batch_size)
+
+    async def create(self, report: dict):
+        await self.collection.insert_one(report)
+
+
+users_repo = UsersRepository(LazyCollection("users"))
+chats_repo = ChatsRepository(LazyCollection("chats"))
+reports_repo = ReportsRepository(LazyCollection("reports"))
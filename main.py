@@ -1,45 +1,126 @@
-from fastapi import FastAPI, Body, HTTPException, UploadFile, File, Query, Form
+from fastapi import FastAPI, Body, HTTPException, UploadFile, File, Query, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from pymongo import MongoClient
-from passlib.hash import bcrypt
-import pyotp, qrcode, os, uuid
-from io import BytesIO
-from PIL import Image
+import pyotp, os
+import asyncio
 import random
+import threading
+import importlib
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
 from dotenv import load_dotenv
 
-from utils.model_downloader import download_file
-from utils.config import MODEL_URLS
+from agrogpt_captioner.engine import CaptionError, caption_engine
+from database.database import close_clients, get_async_client, get_async_db, pool_stats
+from database.indexes import ensure_indexes
+from database.repositories import chats_repo, decode_cursor, encode_cursor, users_repo
+from routes.chat import chat_engine, router as chat_router
+from routes.export import router as export_router
+from utils.admission import AdmissionMiddleware, ConcurrencyGate, EndpointClass, TokenBuckets
+from utils.metrics import MetricsMiddleware, collectors, render_prometheus, stage, stats_collector
+from utils.model_downloader import download_all, manifest_artifacts
+from utils.password_handler import hash_password_async, password_executor, pwd_context, verify_credentials_async
+from utils.qr_cache import prerender_qr, qr_cache, qr_png_response
+from utils.scratch import scratch_store
+from utils.token_service import create_access_token, token_cache
+from utils.translation import translator
+from utils.uploads import archive_upload, decode_image, read_upload
+from utils.config import MODEL_URLS, settings
 
 # BLIP captioner (can be stubbed later if disabled)
 #from agrogpt_captioner import caption_image
 
 
+# ─────────────────────────────
+# ENV + DB
+# ─────────────────────────────
+# Settings read .env themselves (utils/config.py); this also exposes it to
+# plain os.environ readers such as PORT in the entrypoint
+load_dotenv()
+
+# One shared, tuned connection pool (see database/database.py), opened by the
+# lifespan; handlers go through the async repositories so they never block the event loop.
+
 # ─────────────────────────────
 # App init
 # ─────────────────────────────
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # startup_event / shutdown_event live in the STARTUP section below
+    await startup_event()
+    try:
+        yield
+    finally:
+        await shutdown_event()
+
+app = FastAPI(lifespan=lifespan)
 @app.get("/")
 def root():
     return {"message": "AgroGPT backend running"}
 
 # --- Optional Binary Classifier (disabled on Railway) ---
 try:
-    from routes.binary_classifier import router as binary_classifier_router
-    app.include_router(binary_classifier_router)
+    from routes import binary_classifier
+    app.include_router(binary_classifier.router)
     print("Binary classifier enabled")
 except Exception as e:
+    binary_classifier = None
     print("Binary classifier disabled:", e)
 
+app.include_router(export_router)
+app.include_router(chat_router)
+
 @app.get("/healthz")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/readyz")
+def readiness_check():
+    if binary_classifier is not None and settings.classifier_warmup_on_startup:
+        state = binary_classifier.warmup_state
+        if state != "ready":
+            return JSONResponse(status_code=503, content={"status": "not_ready", "classifier": state})
+    if settings.llm_enabled and settings.llm_load_on_startup and chat_engine().state != "ready":
+        return JSONResponse(status_code=503, content={"status": "not_ready", "chat_model": chat_engine().state})
+    return {"status": "ready"}
+
 #app.include_router(binary_classifier_router)
-#app.include_router(chat_router)
+
+# ─────────────────────────────
+# ADMISSION CONTROL (image routes)
+# ─────────────────────────────
+# Multipart framing on top of the file itself
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+image_gate = ConcurrencyGate(
+    max_concurrent=settings.admission_image_max_concurrent,
+    max_queue=settings.admission_image_max_queue,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    retry_after=settings.admission_retry_after_seconds,
+)
+image_buckets = None
+if settings.rate_limit_image_per_minute > 0:
+    image_buckets = TokenBuckets(settings.rate_limit_image_per_minute / 60, settings.rate_limit_image_burst, settings.rate_limit_max_keys)
+
+# One gate and one set of buckets for all image routes: they compete for the same CPU and memory
+image_endpoints = EndpointClass("image", image_gate, image_buckets, settings.max_upload_bytes + UPLOAD_OVERHEAD_BYTES)
+# predict-batch holds every file in memory at once, so its whole body gets a cap
+# well below max_upload_bytes x classifier_max_batch_files
+image_batch_endpoints = EndpointClass(
+    "image_batch", image_gate, image_buckets,
+    min(settings.admission_image_batch_max_bytes, settings.max_upload_bytes * settings.classifier_max_batch_files) + UPLOAD_OVERHEAD_BYTES,
+)
+
+# Added before CORS so CORS wraps it: 429/503 rejections still carry CORS headers
+# and browsers can read Retry-After
+app.add_middleware(AdmissionMiddleware, trusted_proxies=settings.trusted_proxies, routes={
+    "/detect-image": image_endpoints,
+    "/predict": image_endpoints,
+    "/binary-classifier/predict": image_endpoints,
+    "/binary-classifier/predict-batch": image_batch_endpoints,
+})
 
 # ─────────────────────────────
 # CORS
@@ -50,47 +131,111 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
 # ─────────────────────────────
-# ENV + DB
+# METRICS
 # ─────────────────────────────
-load_dotenv()
-
-MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise RuntimeError("MONGO_URI not found in environment variables")
-
-client = MongoClient(MONGO_URI)
-db = client["agrogpt"]
-users = db["users"]
-chats = db["chats"]
-
-# ─────────────────────────────
-# TEMP DIR
-# ─────────────────────────────
-tmp_dir = os.path.join(os.getcwd(), "tmp")
-os.makedirs(tmp_dir, exist_ok=True)
+if settings.metrics_enabled:
+    # Added last so it wraps everything, CORS included
+    app.add_middleware(MetricsMiddleware)
+
+collectors.extend([
+    stats_collector("db_pool", pool_stats.stats),
+    stats_collector("password_pool", password_executor.stats),
+    stats_collector("captioner", caption_engine.stats),
+    stats_collector("scratch", scratch_store.stats),
+    stats_collector("token_cache", token_cache.stats),
+    stats_collector("qr_cache", qr_cache.stats),
+    stats_collector("translation", translator.stats),
+    # image and image_batch share one gate; each reports it alongside its own body-size rejections
+    stats_collector("admission_image", image_endpoints.stats),
+    stats_collector("admission_image_batch", image_batch_endpoints.stats),
+])
+if settings.llm_enabled:
+    collectors.append(stats_collector("llm", chat_engine().stats))
+if binary_classifier is not None:
+    collectors.append(stats_collector("classifier_batcher", binary_classifier.batcher.stats))
+    collectors.append(stats_collector("classifier_result_cache", binary_classifier.result_cache.stats))
+
+# The one stats surface: every subsystem's stats() as gauges
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 # ─────────────────────────────
 # MODELS (download only, no heavy load)
 # ─────────────────────────────
 
 def ensure_models():
-    bc = MODEL_URLS.get("binary_classifier")
-    if bc:
-        download_file(bc["url"], bc["path"])
-
-    mm = MODEL_URLS.get("merged_model")
-    if mm:
-        for filename, file_id in mm["files"].items():
-            url = f"https://drive.google.com/uc?id={file_id}"
-            path = os.path.join(mm["dir"], filename)
-            download_file(url, path)
-
-@app.on_event("startup")
-def startup_event():
+    # All artifacts in parallel; each resumes, verifies and lands atomically
+    download_all(manifest_artifacts(MODEL_URLS), workers=settings.download_workers)
+
+# Imported lazily by the modules that use them; loading them in the background
+# after startup keeps the first real requests from paying for it
+PREWARM_MODULES = ("PIL.Image", "qrcode", "jose.jwt", "requests")
+
+def prewarm():
+    started = time.perf_counter()
+    for name in PREWARM_MODULES:
+        importlib.import_module(name)
+    pwd_context()
+    print(f"✅ Prewarmed lazy imports in {time.perf_counter() - started:.2f}s")
+
+async def create_indexes():
+    try:
+        await ensure_indexes(get_async_db())
+        print("✅ MongoDB indexes ensured")
+    except Exception as e:
+        print("❌ MongoDB index creation failed:", e)
+
+async def load_chat_model():
+    try:
+        await chat_engine().ensure_loaded()
+    except Exception as e:
+        print("❌ Chat model load failed:", e)
+
+# ─────────────────────────────
+# STARTUP / SHUTDOWN (run by the lifespan)
+# ─────────────────────────────
+async def startup_event():
     print("Startup: skipping heavy model downloads")
+    scratch_store.start()
+
+    # The app owns the Mongo client: created on the serving loop, closed on shutdown.
+    # Construction doesn't connect; the first command (or the index task) does.
+    get_async_client()
+
+    if settings.prewarm_on_startup:
+        app.state.prewarm_task = asyncio.create_task(asyncio.to_thread(prewarm))
+
+    # Index builds can take a while on big collections; don't hold up startup
+    app.state.index_task = asyncio.create_task(create_indexes())
+
+    if binary_classifier is not None and settings.classifier_warmup_on_startup:
+        print("Startup: warming up binary classifier in background")
+        threading.Thread(target=binary_classifier.warmup, daemon=True).start()
+
+    if settings.captioning_enabled:
+        caption_engine.start()
+        app.state.caption_task = asyncio.create_task(asyncio.to_thread(caption_engine.warm))
+
+    if settings.llm_enabled and settings.llm_load_on_startup:
+        print("Startup: loading chat model in background")
+        app.state.llm_task = asyncio.create_task(load_chat_model())
+
+async def shutdown_event():
+    index_task = getattr(app.state, "index_task", None)
+    if index_task is not None and not index_task.done():
+        index_task.cancel()
+    scratch_store.stop()
+    caption_engine.stop()
+    if settings.llm_enabled:
+        chat_engine().stop()
+    if binary_classifier is not None:
+        binary_classifier.result_cache.close()
+    await close_clients()
 
 # ─────────────────────────────
 # SCHEMAS
@@ -112,6 +257,8 @@ class ChatMessageModel(BaseModel):
     message: str
     response: str = ""
     title: str | None = None
+    # Client-generated message ID; makes migration retries idempotent
+    client_id: str | None = None
 
 # ─────────────────────────────
 # TRANSLATIONS
@@ -132,22 +279,24 @@ chat_translations = {
 # AUTH & CHAT ENDPOINTS (UNCHANGED LOGIC)
 # ─────────────────────────────
 @app.post("/api/auth/signup")
-def signup(data: SignupModel):
-    if users.find_one({"phone": data.phone}):
+async def signup(data: SignupModel):
+    if await users_repo.find_by_phone(data.phone):
         return {"status": "exists"}
-    users.insert_one({"name": data.name, "phone": data.phone, "totp_secret": pyotp.random_base32()})
+    await users_repo.create({"name": data.name, "phone": data.phone, "totp_secret": pyotp.random_base32()})
     return {"status": "success"}
 
 @app.post("/register")
-def register(data: SigninModel = Body(...)):
-    if users.find_one({"email": data.email}):
+async def register(data: SigninModel = Body(...)):
+    if await users_repo.find_by_email(data.email):
         return {"status": "exists"}
-    users.insert_one({"email": data.email, "password": bcrypt.hash(data.password), "totp_secret": pyotp.random_base32()})
+    with stage("password"):
+        password_hash = await hash_password_async(data.password)
+    await users_repo.create({"email": data.email, "password": password_hash, "totp_secret": pyotp.random_base32()})
     return {"status": "success"}
 
 @app.get("/generate-qr/{email}")
-def generate_qr(email: str):
-    user = users.find_one({"email": email})
+async def generate_qr(email: str):
+    user = await users_repo.find_by_email(email)
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -160,10 +309,8 @@ def generate_qr(email: str):
         issuer_name="AgroGPT"
     )
 
-    img = qrcode.make(uri)
-
-    file_path = os.path.join(tmp_dir, f"{email}_qr.png")
-    img.save(file_path)
+    # Rendered once per secret and held in memory; served by /get-qr with an ETag
+    await prerender_qr(email, uri)
 
     return {
         "status": "success",
@@ -171,52 +318,117 @@ def generate_qr(email: str):
         "manual_key": secret
     }
 
+@app.get("/get-qr/{email}")
+async def get_qr(email: str, request: Request):
+    user = await users_repo.find_by_email(email)
+
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    uri = pyotp.TOTP(user["totp_secret"]).provisioning_uri(name=email, issuer_name="AgroGPT")
+    return await qr_png_response(request, email, uri)
+
 @app.post("/verify-totp")
-def verify_login(data: VerifyTOTPModel = Body(...)):
-    user = users.find_one({"email": data.email})
-    if not user or not bcrypt.verify(data.password, user["password"]):
+async def verify_login(data: VerifyTOTPModel = Body(...)):
+    user = await users_repo.find_by_email(data.email)
+    if not user or not user.get("password"):
         return {"status": "error"}
-    if not pyotp.TOTP(user["totp_secret"]).verify(data.code):
+    with stage("password"):
+        valid = await verify_credentials_async(data.password, user["password"], user["totp_secret"], data.code)
+    if not valid:
         return {"status": "error"}
-    return {"status": "success"}
+    # Bearer token for the authenticated routes (/api/export, /api/chat/stream)
+    return {"status": "success", "token": create_access_token(user["email"])}
+
+def chat_document(email: str, chat: ChatMessageModel, ct: dict, timestamp: datetime) -> dict:
+    doc = {"email": email, "title": chat.title or "Untitled", "message": chat.message, "response": chat.response or ct["userEcho"] + chat.message, "timestamp": timestamp}
+    if chat.client_id:
+        doc["client_id"] = chat.client_id
+    return doc
 
 @app.get("/api/chats/{email}")
-def get_chats(email: str):
-    return {"chats": list(chats.find({"email": email}, {"_id": 0}).sort("timestamp", 1))}
+async def get_chats(email: str):
+    return {"chats": await chats_repo.list_for_email(email)}
+
+CHAT_FIELDS = {"title", "message", "response", "timestamp"}
+
+@app.get("/api/chats/{email}/page")
+async def get_chats_page(
+    email: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None),
+    fields: str | None = Query(None, description="Comma-separated subset of title,message,response,timestamp"),
+):
+    selected = None
+    if fields:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = set(selected) - CHAT_FIELDS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One extra row tells us whether another page exists
+    page = await chats_repo.page_for_email(email, limit + 1, before, selected)
+    has_more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_cursor(page[-1]) if has_more else None
+
+    for chat in page:
+        chat.pop("_id", None)
+        if selected and "timestamp" not in selected:
+            chat.pop("timestamp", None)
+
+    return {"chats": page, "next_cursor": next_cursor}
 
 @app.post("/api/migrate-chats/{email}")
-def migrate_chats(email: str, chat: ChatMessageModel, lang: str = Query("en")):
+async def migrate_chats(email: str, chat: ChatMessageModel, lang: str = Query("en")):
     ct = chat_translations.get(lang, chat_translations["en"])
-    response = chat.response or ct["userEcho"] + chat.message
-    chats.insert_one({"email": email, "title": chat.title or "Untitled", "message": chat.message, "response": response, "timestamp": datetime.utcnow()})
+    # A retry of an already migrated client_id stores nothing
+    await chats_repo.create_once(chat_document(email, chat, ct, datetime.utcnow()))
     return {"status": "success"}
 
+@app.post("/api/migrate-chats/{email}/bulk")
+async def migrate_chats_bulk(email: str, chats: list[ChatMessageModel], lang: str = Query("en")):
+    if len(chats) > settings.migrate_max_chats:
+        raise HTTPException(status_code=400, detail=f"Too many chats. Send at most {settings.migrate_max_chats} per request.")
+
+    ct = chat_translations.get(lang, chat_translations["en"])
+    now = datetime.utcnow()
+    inserted, duplicates = await chats_repo.create_many([chat_document(email, chat, ct, now) for chat in chats])
+    return {"status": "success", "inserted": inserted, "duplicates": duplicates}
+
 # ─────────────────────────────
 # IMAGE ENDPOINTS
 # ─────────────────────────────
 @app.post("/detect-image")
 async def detect_image(file: UploadFile = File(...), lang: str = Query("en")):
-    filename = f"{uuid.uuid4().hex}_{file.filename}"
-    path = os.path.join(tmp_dir, filename)
-    with open(path, "wb") as f:
-        f.write(await file.read())
+    data = await read_upload(file)
+    await archive_upload(data, file.filename)
 
-    img = Image.open(path)
+    img = await decode_image(data)
     ct = chat_translations.get(lang, chat_translations["en"])
     return {"bot_response": random.choice([ct["plantHealthy"], ct["nitrogenDeficiency"], ct["pestDetected"]])}
 
 @app.post("/predict")
 async def predict(prompt: str = Form(...), image: UploadFile = File(...), email: str = Form(...)):
-    filename = f"{uuid.uuid4().hex}_{image.filename}"
-    path = os.path.join(tmp_dir, filename)
-    with open(path, "wb") as f:
-        f.write(await image.read())
+    data = await read_upload(image)
+    await archive_upload(data, image.filename)
 
     caption = "Image analysis temporarily unavailable"
+    if settings.captioning_enabled:
+        try:
+            with stage("caption"):
+                caption = await caption_engine.caption(data)
+        except CaptionError as e:
+            print(f"⚠️ Captioning failed: {e}")
 
     answer = f"Image analysis completed: {caption}"
 
-    chats.insert_one({"email": email, "title": "Image Analysis", "message": prompt, "response": answer, "timestamp": datetime.utcnow()})
+    await chats_repo.create({"email": email, "title": "Image Analysis", "message": prompt, "response": answer, "timestamp": datetime.utcnow()})
     return {"answer": answer}
 
 # ─────────────────────────────
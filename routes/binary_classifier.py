@@ -1,19 +1,24 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-import tensorflow as tf
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 import numpy as np
-from PIL import Image
-import io
+import asyncio
 import os
+import threading
 
+from binary_classification.backends import load_backend
+from binary_classification.preprocessing import IMG_SIZE, get_executor, preprocess, preprocess_into
+from utils.batcher import MicroBatcher
+from utils.metrics import stage
 from utils.model_downloader import download_file
-from utils.config import MODEL_URLS
+from utils.result_cache import ResultCache
+from utils.translation import Language, translate_async, translate_batch_async
+from utils.uploads import read_upload
+from utils.config import MODEL_URLS, settings
 
 router = APIRouter(
     prefix="/binary-classifier",
     tags=["Binary Classification"]
 )
 
-IMG_SIZE = (224, 224)
 THRESHOLD = 0.5
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -22,33 +27,116 @@ MODEL_PATH = os.path.join(
     "binary_classification",
     "agro_classifier_FINAL_CLEAN.keras"
 )
+TFLITE_PATH = os.path.join(BASE_DIR, settings.classifier_tflite_path)
 
 model = None
+model_version = None
+model_lock = threading.Lock()
+
+result_cache = ResultCache(
+    max_entries=settings.result_cache_max_entries,
+    ttl_seconds=settings.result_cache_ttl_seconds,
+    persist_path=settings.result_cache_path,
+    disk_max_entries=settings.result_cache_disk_max_entries,
+    purge_interval=settings.result_cache_purge_interval_seconds,
+)
+
+# idle → loading → ready | failed
+warmup_state = "idle"
 
 
 def load_model_once():
-    global model
+    global model, model_version
 
     if model is not None:
         return
 
-    # 🔹 Ensure model file exists (lazy download)
-    bc = MODEL_URLS["binary_classifier"]
-    download_file(bc["url"], bc["path"])
+    with model_lock:
+        if model is not None:
+            return
+
+        backend = settings.classifier_backend
+        if backend == "keras":
+            # 🔹 Ensure model file exists (lazy download)
+            bc = MODEL_URLS["binary_classifier"]
+            download_file(bc["url"], bc["path"], sha256=bc.get("sha256"), size=bc.get("size"))
+            path = MODEL_PATH
+        else:
+            # Exported locally with `python -m binary_classification.export`
+            path = TFLITE_PATH
+
+        try:
+            print(f"🔄 Loading binary classifier model ({backend})...")
+            print("📂 Path:", path)
+            model = load_backend(backend, path, num_threads=settings.classifier_num_threads)
+            # Cached results are only reused for the exact same model file
+            stat = os.stat(path)
+            model_version = f"{backend}:{os.path.basename(path)}:{stat.st_size}:{int(stat.st_mtime)}"
+            print("✅ Binary classifier model loaded successfully")
+        except Exception as e:
+            print("❌ Failed to load binary classifier:", e)
+            model = None
 
+
+async def ensure_model():
+    # Loading takes seconds; keep it off the event loop
+    if model is None:
+        await asyncio.to_thread(load_model_once)
+
+
+def warmup():
+    global warmup_state
+
+    warmup_state = "loading"
     try:
-        print("🔄 Loading binary classifier model...")
-        print("📂 Path:", MODEL_PATH)
-        model = tf.keras.models.load_model(MODEL_PATH, compile=False)
-        print("✅ Binary classifier model loaded successfully")
+        load_model_once()
+        if model is None:
+            warmup_state = "failed"
+            return
+        # First call traces the predict graph; do it before real traffic arrives
+        run_model(np.zeros((1, *IMG_SIZE, 3), dtype="float32"))
+        warmup_state = "ready"
+        print("✅ Binary classifier warm-up finished")
     except Exception as e:
-        print("❌ Failed to load binary classifier:", e)
-        model = None
+        print("❌ Binary classifier warm-up failed:", e)
+        warmup_state = "failed"
+
+
+def run_model(batch: np.ndarray) -> np.ndarray:
+    return model.predict(batch)
+
+
+batcher = MicroBatcher(
+    run_model,
+    max_batch_size=settings.classifier_max_batch_size,
+    max_wait_ms=settings.classifier_max_wait_ms,
+)
+
+
+def format_prediction(pred: float) -> dict:
+    if pred < THRESHOLD:
+        result = "plant_pest"
+        confidence = (1 - pred) * 100
+        is_valid = True
+        message = f"Plant pest detected with {confidence:.2f}% confidence."
+    else:
+        result = "invalid_image"
+        confidence = pred * 100
+        is_valid = False
+        message = "Please upload a clear plant pest image."
+
+    return {
+        "status": "success",
+        "result": result,
+        "confidence": round(confidence, 2),
+        "is_valid": is_valid,
+        "message": message
+    }
 
 
 @router.post("/predict")
-async def predict_binary(file: UploadFile = File(...)):
-    load_model_once()
+async def predict_binary(file: UploadFile = File(...), lang: Language = Query("en")):
+    await ensure_model()
 
     if model is None:
         raise HTTPException(
@@ -63,33 +151,110 @@ async def predict_binary(file: UploadFile = File(...)):
         )
 
     try:
-        image_bytes = await file.read()
-        img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        img = img.resize(IMG_SIZE)
-
-        img_array = np.asarray(img, dtype="float32") / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
+        image_bytes = await read_upload(file)
 
-        pred = float(model.predict(img_array)[0][0])
+        key = result_cache.make_key(image_bytes, model_version)
+        pred = await result_cache.get(key)
+        if pred is None:
+            loop = asyncio.get_running_loop()
+            with stage("preprocess"):
+                img_array = await loop.run_in_executor(get_executor(), preprocess, image_bytes)
+            with stage("inference"):
+                pred = float(await batcher.submit(img_array))
+            await result_cache.put(key, pred)
 
-        if pred < THRESHOLD:
-            result = "plant_pest"
-            confidence = (1 - pred) * 100
-            is_valid = True
-            message = f"Plant pest detected with {confidence:.2f}% confidence."
-        else:
-            result = "invalid_image"
-            confidence = pred * 100
-            is_valid = False
-            message = "Please upload a clear plant pest image."
-
-        return {
-            "status": "success",
-            "result": result,
-            "confidence": round(confidence, 2),
-            "is_valid": is_valid,
-            "message": message
-        }
+        result = format_prediction(pred)
+        with stage("translate"):
+            result["message"] = await translate_async(result["message"], lang)
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/predict-batch")
+async def predict_binary_batch(files: list[UploadFile] = File(...), lang: Language = Query("en")):
+    await ensure_model()
+
+    if model is None:
+        raise HTTPException(
+            status_code=500,
+            detail="Binary classifier model is not available."
+        )
+
+    if len(files) > settings.classifier_max_batch_files:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many files. Upload at most {settings.classifier_max_batch_files} images per request."
+        )
+
+    async def load(file: UploadFile):
+        if not (file.content_type or "").startswith("image/"):
+            raise ValueError("Invalid file type. Please upload an image.")
+        return await read_upload(file)
+
+    uploads = await asyncio.gather(*(load(f) for f in files), return_exceptions=True)
+
+    results = [None] * len(files)
+    keys = [None] * len(files)
+    pending = []
+
+    def fail(i, error):
+        results[i] = {"filename": files[i].filename, "status": "error", "detail": getattr(error, "detail", str(error))}
+
+    for i, data in enumerate(uploads):
+        if isinstance(data, Exception):
+            fail(i, data)
+            continue
+        keys[i] = result_cache.make_key(data, model_version)
+        pred = await result_cache.get(keys[i])
+        if pred is not None:
+            results[i] = {"filename": files[i].filename, **format_prediction(pred)}
+        else:
+            pending.append(i)
+
+    if pending:
+        # Decode every image in parallel straight into its row of the batch tensor
+        loop = asyncio.get_running_loop()
+        batch = np.empty((len(pending), *IMG_SIZE, 3), dtype=np.float32)
+        with stage("preprocess"):
+            decoded = await asyncio.gather(
+                *(loop.run_in_executor(get_executor(), preprocess_into, uploads[i], batch[row]) for row, i in enumerate(pending)),
+                return_exceptions=True
+            )
+
+        ok = [not isinstance(d, Exception) for d in decoded]
+        for i, d in zip(pending, decoded):
+            if isinstance(d, Exception):
+                fail(i, d)
+        pending = [i for i, good in zip(pending, ok) if good]
+        if not all(ok):
+            batch = batch[ok]
+
+    if pending:
+        try:
+            with stage("inference"):
+                preds = await asyncio.to_thread(run_model, batch)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+        for i, pred in zip(pending, preds):
+            await result_cache.put(keys[i], float(pred))
+            results[i] = {"filename": files[i].filename, **format_prediction(float(pred))}
+
+    translated = [i for i, r in enumerate(results) if "message" in r]
+    if translated:
+        with stage("translate"):
+            messages = await translate_batch_async([results[i]["message"] for i in translated], lang)
+        for i, message in zip(translated, messages):
+            results[i]["message"] = message
+
+    return {
+        "status": "success",
+        "count": len(results),
+        "failed": sum(r["status"] == "error" for r in results),
+        "results": results
+    }
+
@@ -1,12 +1,110 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from datetime import datetime
+import asyncio
+import json
+
+from database.repositories import chats_repo
+from utils.config import settings
+from utils.token_service import get_current_user
 
 router = APIRouter(
     prefix="/api/chat",
     tags=["Chat"]
 )
 
+
+class ChatPromptModel(BaseModel):
+    message: str
+    title: str | None = None
+    # Client-generated message ID; a retried request doesn't store the answer twice
+    client_id: str | None = None
+    max_new_tokens: int | None = Field(None, ge=1)
+    temperature: float | None = Field(None, ge=0.0, le=2.0)
+
+
+def chat_engine():
+    # Imported on first use: agrogpt_llm needs numpy, which only chat deployments install
+    from agrogpt_llm.engine import generation_engine
+    return generation_engine
+
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def current_chat_owner(user: dict = Depends(get_current_user)) -> str:
+    # Chats are stored under the email when there is one, else under the phone
+    return user.get("email") or user["phone"]
+
+
+async def save_chat(owner: str, prompt: ChatPromptModel, response: str):
+    doc = {"email": owner, "title": prompt.title or "Untitled", "message": prompt.message, "response": response, "timestamp": datetime.utcnow()}
+    if prompt.client_id:
+        doc["client_id"] = prompt.client_id
+    await chats_repo.create_once(doc)
+
+
 @router.get("/")
 def chat_demo():
     return {
-        "message": "Chat endpoint placeholder — will connect to AgroGPT model later"
+        "message": "POST /api/chat/stream to stream an AgroGPT answer as server-sent events",
+        "enabled": settings.llm_enabled,
+        "model": chat_engine().state if settings.llm_enabled else "disabled",
     }
+
+
+@router.post("/stream")
+async def chat_stream(prompt: ChatPromptModel, owner: str = Depends(current_chat_owner)):
+    if not settings.llm_enabled:
+        raise HTTPException(status_code=503, detail="Chat generation is disabled.")
+    from agrogpt_llm.engine import GenerationBusy, GenerationError
+    generation_engine = chat_engine()
+
+    try:
+        await generation_engine.ensure_loaded()
+    except Exception as e:
+        print("❌ Failed to load chat model:", e)
+        raise HTTPException(status_code=503, detail="Chat model is not available.")
+
+    messages = [
+        {"role": "system", "content": settings.llm_system_prompt},
+        {"role": "user", "content": prompt.message},
+    ]
+    try:
+        generation = generation_engine.submit(messages, prompt.max_new_tokens, prompt.temperature)
+    except GenerationBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Chat is busy, please retry.",
+            headers={"Retry-After": str(settings.llm_retry_after_seconds)},
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            async for piece in generation:
+                yield sse("token", {"text": piece})
+        except GenerationError as e:
+            yield sse("error", {"detail": str(e)})
+            return
+        finally:
+            # No-op once finished; if the client went away mid-stream, frees its batch slot
+            generation.cancel()
+
+        # The answer is complete; store it even if the client disconnects right now
+        await asyncio.shield(asyncio.ensure_future(save_chat(owner, prompt, generation.text)))
+        yield sse("done", {
+            "response": generation.text,
+            "finish_reason": generation.finish_reason,
+            "prompt_tokens": generation.prompt_tokens,
+            "completion_tokens": generation.completion_tokens,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+import json
+import zlib
+
+from bson import ObjectId
+
+from database.repositories import chats_repo, reports_repo
+from utils.config import settings
+from utils.token_service import get_current_user
+
+router = APIRouter(prefix="/api/export", tags=["Export"])
+
+# Flush to the client once this much NDJSON has accumulated
+CHUNK_BYTES = 64 * 1024
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def ndjson_lines(email: str, phone: str | None):
+    batch_size = settings.export_batch_size
+
+    async for chat in chats_repo.iter_for_email(email, batch_size):
+        yield json.dumps({"type": "chat", **chat}, default=_json_default, ensure_ascii=False) + "\n"
+
+    if phone:
+        async for report in reports_repo.iter_for_phone(phone, batch_size):
+            yield json.dumps({"type": "report", **report}, default=_json_default, ensure_ascii=False) + "\n"
+
+
+async def chunked(lines, compress: bool):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if compress else None
+    buf = []
+    size = 0
+
+    async for line in lines:
+        data = line.encode()
+        buf.append(data)
+        size += len(data)
+        if size >= CHUNK_BYTES:
+            chunk = b"".join(buf)
+            buf, size = [], 0
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+
+    chunk = b"".join(buf)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+@router.get("/{email}")
+async def export_history(email: str, gzip: bool = Query(False), user: dict = Depends(get_current_user)):
+    # Chats are keyed by the email, or by the phone for phone-only accounts (see routes/chat.py)
+    if email not in (user.get("email"), user.get("phone")):
+        raise HTTPException(status_code=403, detail="Not allowed to export this history")
+
+    filename = f"agrogpt-history-{datetime.utcnow():%Y%m%d}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        chunked(ndjson_lines(email, user.get("phone")), gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
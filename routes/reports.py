@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
-from database.database import reports_collection
-from utils.oauth2 import verify_token
+from database.repositories import reports_repo
+from utils.token_service import get_current_subject
 
 router = APIRouter(prefix="/api/reports", tags=["Reports"])
 
@@ -10,12 +10,12 @@ class Report(BaseModel):
     description: str
 
 @router.post("/")
-def create_report(report: Report, phone: str = Depends(verify_token)):
+async def create_report(report: Report, phone: str = Depends(get_current_subject)):
     new_report = {"phone": phone, "title": report.title, "description": report.description}
-    reports_collection.insert_one(new_report)
+    await reports_repo.create(new_report)
     return {"status": "success", "message": "Report created successfully"}
 
 @router.get("/")
-def get_reports(phone: str = Depends(verify_token)):
-    reports = list(reports_collection.find({"phone": phone}, {"_id": 0}))
+async def get_reports(phone: str = Depends(get_current_subject)):
+    reports = await reports_repo.list_for_phone(phone)
     return {"status": "success", "data": reports}
@@ -0,0 +1,241 @@
+"""Admission control for expensive endpoints: rate limits, concurrency gates, body size.
+
+``AdmissionMiddleware`` runs before routing and before any of the request body
+is read, so a rejected 12 MP upload costs a header parse rather than a
+buffered multipart body. Each protected path belongs to an ``EndpointClass``
+with its own token buckets (per JWT subject, or client IP when there is no
+valid token) and its own concurrency gate with a bounded wait queue.
+"""
+import asyncio
+import ipaddress
+import math
+import threading
+import time
+import types
+from collections import OrderedDict
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from utils.token_service import decode_subject
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, detail: str, retry_after: float):
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class ConcurrencyGate:
+    """At most ``max_concurrent`` requests inside, ``max_queue`` waiting; the rest get 503."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+        # Only touched from the event loop thread, so the counters need no lock
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self):
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_full += 1
+                raise Rejected(503, "Server busy, please retry", self.retry_after)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise Rejected(503, "Server busy, please retry", self.retry_after)
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class TokenBuckets:
+    """One token bucket per key: ``burst`` tokens, refilled at ``rate`` per second."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def take(self, key: str) -> float:
+        """Spend one token; returns 0 when allowed, otherwise seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                wait = 0.0
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+                self.limited += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Idle keys are the oldest; a dropped one just starts again with a full bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"per_second": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+
+class EndpointClass:
+    def __init__(self, name: str, gate: ConcurrencyGate, buckets: TokenBuckets | None, max_body_bytes: int | None):
+        self.name = name
+        self.gate = gate
+        self.buckets = buckets
+        self.max_body_bytes = max_body_bytes
+        self.rejected_too_large = 0
+
+    def stats(self) -> dict:
+        return {
+            "gate": self.gate.stats(),
+            "rate_limit": self.buckets.stats() if self.buckets else None,
+            "max_body_bytes": self.max_body_bytes,
+            "rejected_too_large": self.rejected_too_large,
+        }
+
+
+def _header(scope, name: bytes) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+class TrustedProxies:
+    """Which peers' ``X-Forwarded-For`` headers to believe, from a comma-separated setting."""
+
+    def __init__(self, spec: str):
+        entries = [e.strip() for e in spec.split(",") if e.strip()]
+        self.any = "*" in entries
+        self.networks = [ipaddress.ip_network(e, strict=False) for e in entries if e != "*"]
+
+    def __contains__(self, address: str) -> bool:
+        if self.any:
+            return True
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.networks)
+
+    def client_ip(self, scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else "unknown"
+        forwarded = _header(scope, b"x-forwarded-for")
+        if not forwarded or peer not in self:
+            return peer
+        hops = [h.strip() for h in forwarded.split(",") if h.strip()]
+        if self.any:
+            # Only the hop our own proxy appended is trustworthy; earlier ones are client-supplied
+            return hops[-1] if hops else peer
+        # Right to left, skipping our own proxies: the first other address is the client
+        for hop in reversed(hops):
+            if hop not in self:
+                return hop
+        return hops[0] if hops else peer
+
+
+def rate_limit_key(scope, proxies: TrustedProxies) -> str:
+    auth = _header(scope, b"authorization")
+    if auth and auth.lower().startswith("bearer "):
+        try:
+            return "sub:" + decode_subject(auth[7:].strip())
+        except Exception:
+            pass  # invalid token: the route's own auth (if any) rejects it
+    return "ip:" + proxies.client_ip(scope)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, routes: dict[str, EndpointClass], trusted_proxies: str = ""):
+        self.app = app
+        self.routes = routes
+        self.proxies = TrustedProxies(trusted_proxies)
+
+    async def __call__(self, scope, receive, send):
+        endpoint = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if endpoint is None or scope["method"] == "OPTIONS":
+            return await self.app(scope, receive, send)
+
+        try:
+            self._check_size(endpoint, scope)
+            if endpoint.buckets is not None:
+                wait = endpoint.buckets.take(rate_limit_key(scope, self.proxies))
+                if wait:
+                    raise Rejected(429, "Too many requests", wait)
+            await endpoint.gate.acquire()
+        except Rejected as e:
+            # Rejected before routing; label metrics with the (static) path
+            scope.setdefault("route", types.SimpleNamespace(path=scope["path"]))
+            headers = {"Retry-After": str(max(1, math.ceil(e.retry_after)))} if e.status != 413 else None
+            response = JSONResponse(status_code=e.status, content={"detail": e.detail}, headers=headers)
+            return await response(scope, receive, send)
+
+        if endpoint.max_body_bytes is not None:
+            receive = self._limit_body(endpoint, receive)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint.gate.release()
+
+    @staticmethod
+    def _limit_body(endpoint: EndpointClass, receive):
+        # Chunked uploads carry no Content-Length; count bytes as the app reads them.
+        # Raised inside the handler's body parsing, so FastAPI answers it as a normal 413.
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > endpoint.max_body_bytes:
+                    endpoint.rejected_too_large += 1
+                    raise HTTPException(status_code=413, detail=f"Request too large. Maximum size is {endpoint.max_body_bytes} bytes.")
+            return message
+
+        return limited_receive
+
+    @staticmethod
+    def _check_size(endpoint: EndpointClass, scope):
+        if endpoint.max_body_bytes is None:
+            return
+        length = _header(scope, b"content-length")
+        if length is not None and length.isdigit() and int(length) > endpoint.max_body_bytes:
+            endpoint.rejected_too_large += 1
+            raise Rejected(413, f"Request too large. Maximum size is {endpoint.max_body_bytes} bytes.", 0)
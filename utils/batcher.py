@@ -0,0 +1,107 @@
+import asyncio
+import time
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects single inputs from concurrent requests and runs them as one batch.
+
+    A batch is flushed once it holds ``max_batch_size`` items or once the
+    oldest queued item has waited ``max_wait_ms``. The forward pass runs on a
+    worker thread so the event loop keeps serving other requests.
+    """
+
+    def __init__(self, predict_fn, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+        self.batches = 0
+        self.failed_batches = 0
+        self.items = 0
+        self.last_batch_size = 0
+        self.max_queue_depth = 0
+        self.inference_seconds = 0.0
+        self.batch_size_counts: dict[int, int] = {}
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: np.ndarray):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Callers that disconnected while queued don't need a forward pass
+        return [(item, future) for item, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                # Inside the try: a bad input (e.g. wrong shape) fails this batch, not the worker
+                inputs = np.stack([item for item, _ in batch])
+                outputs = await asyncio.to_thread(self.predict_fn, inputs)
+            except Exception as e:
+                self.failed_batches += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Successful batches only, matching the batches count avg_inference_ms divides by
+            self.inference_seconds += time.perf_counter() - started
+            self.batches += 1
+            self.items += len(batch)
+            self.last_batch_size = len(batch)
+            self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> dict:
+        avg_batch = self.items / self.batches if self.batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "items": self.items,
+            "last_batch_size": self.last_batch_size,
+            "avg_batch_size": round(avg_batch, 3),
+            "avg_batch_fill": round(avg_batch / self.max_batch_size, 3),
+            "avg_inference_ms": round(self.inference_seconds * 1000.0 / self.batches, 3) if self.batches else 0.0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+        }
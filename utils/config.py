@@ -1,18 +1,119 @@
+from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 
 class Settings(BaseSettings):
-    # Database
-    mongo_uri: str
+    # Database (MONGO_URL is the name database/database.py used to read)
+    mongo_uri: str = Field(validation_alias=AliasChoices("mongo_uri", "mongo_url"))
+    mongo_db: str = "agrogpt"
+    mongo_tls: bool | None = None
+    mongo_max_pool_size: int = 50
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 60_000
+    mongo_wait_queue_timeout_ms: int = 2_000
+    mongo_connect_timeout_ms: int = 5_000
+    mongo_server_selection_timeout_ms: int = 5_000
+    mongo_socket_timeout_ms: int | None = None
+    mongo_compressors: str = "zlib"
+    export_batch_size: int = 500
+    migrate_max_chats: int = 1000
 
     # JWT
     jwt_secret: str
     jwt_algorithm: str = "HS256"
-    access_token_expire_minutes: int = 30
+    access_token_expire_minutes: int = 180
+    token_cache_max_entries: int = 10000
+    token_cache_ttl_seconds: float = 300.0
 
     # OTP
     totp_issuer: str = "AgroGPT"
+    qr_cache_max_entries: int = 1024
+    qr_cache_spill: bool = False
+    qr_cache_spill_max_entries: int = 8192  # spilled PNGs tracked for deletion on secret rotation
+
+    # Password hashing / verification pool
+    password_workers: int = 4
+    password_max_queue: int = 64
+    password_retry_after_seconds: int = 1
+
+    # Uploads
+    max_upload_bytes: int = 10 * 1024 * 1024
+    archive_uploads: bool = False
+
+    # Admission control for image endpoints (upload + decode + inference)
+    admission_image_max_concurrent: int = 4
+    admission_image_max_queue: int = 16
+    admission_queue_timeout_seconds: float = 5.0
+    admission_retry_after_seconds: int = 2
+    admission_image_batch_max_bytes: int = 48 * 1024 * 1024  # whole predict-batch body; a batch holds one gate slot
+    # Per JWT subject, else client IP. Off by default: behind a proxy every client shares the
+    # proxy's IP unless trusted_proxies is set
+    rate_limit_image_per_minute: float = 0.0
+    rate_limit_image_burst: int = 20
+    rate_limit_max_keys: int = 10000
+    trusted_proxies: str = ""  # comma-separated IPs/CIDRs whose X-Forwarded-For is believed; "*" trusts any peer
+
+    # Scratch storage (tmp/)
+    scratch_max_bytes: int = 512 * 1024 * 1024
+    scratch_ttl_seconds: float = 3600.0
+    scratch_sweep_interval_seconds: float = 60.0
+
+    # Model downloads
+    download_workers: int = 4
+
+    # Binary classifier
+    classifier_max_batch_size: int = 16
+    classifier_max_wait_ms: float = 5.0
+    classifier_max_batch_files: int = 64
+    classifier_warmup_on_startup: bool = False
+    classifier_backend: str = "keras"  # "keras" or "tflite"
+    classifier_tflite_path: str = "binary_classification/agro_classifier_FINAL_CLEAN.tflite"
+    classifier_num_threads: int | None = None
+
+    # Classification result cache
+    result_cache_max_entries: int = 10000
+    result_cache_ttl_seconds: float = 24 * 3600.0
+    result_cache_path: str | None = None
+    result_cache_disk_max_entries: int = 100000  # rows kept in the SQLite file
+    result_cache_purge_interval_seconds: float = 600.0
+
+    # Image captioning (agrogpt_captioner process pool)
+    captioning_enabled: bool = False
+    captioner_model: str = "stub"  # "stub" or "blip"
+    captioner_model_path: str = "Salesforce/blip-image-captioning-base"
+    captioner_workers: int = 1
+    captioner_threads_per_worker: int = 1
+    captioner_timeout_seconds: float = 20.0
+    captioner_max_pending: int = 16
+    captioner_max_length: int = 40
+
+    # Chat generation (agrogpt_llm, NumPy on CPU)
+    llm_enabled: bool = False
+    llm_model_dir: str = "merged_model"  # `python -m agrogpt_llm.tiny models/tiny-llm` for a local test model
+    llm_f32_dir: str | None = None  # where BF16/F16 weights are converted to F32 once; default <llm_model_dir>/f32
+    llm_load_on_startup: bool = False
+    llm_max_batch_size: int = 8  # sequences decoded together per step
+    llm_max_batch_tokens: int = 256  # tokens (prompt chunks + decodes) per step
+    llm_max_pending: int = 32
+    llm_max_context: int = 2048
+    llm_max_new_tokens: int = 256
+    llm_temperature: float = 0.7
+    llm_top_p: float = 0.9
+    llm_retry_after_seconds: int = 5
+    llm_system_prompt: str = "You are AgroGPT, an assistant for farmers. Give short, practical answers."
+
+    # Startup
+    prewarm_on_startup: bool = True  # import lazily-loaded modules in the background after startup
+
+    # Metrics / profiling
+    metrics_enabled: bool = True
+    metrics_profile_sample_rate: float = 0.0  # fraction of requests run under cProfile
+    metrics_slow_request_seconds: float = 1.0  # profiled requests slower than this are printed
+    metrics_profile_top: int = 25
+
+    # Response translation (Argos Translate)
+    translation_cache_max_entries: int = 4096
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -22,6 +123,8 @@ class Settings(BaseSettings):
 
 settings = Settings()
 
+# Optional integrity data: "sha256" / "size" next to "url", or per file as
+# {"id": ..., "sha256": ..., "size": ...} instead of a bare Drive file id.
 MODEL_URLS = {
     "binary_classifier": {
         "url": "https://drive.google.com/file/d/1wV5OFj6k9uC_A--6fYfh-vyOu-TgN6dO/view?usp=sharing",
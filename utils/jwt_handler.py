@@ -1,16 +1,8 @@
-from jose import jwt
-import datetime
-import os
-from dotenv import load_dotenv
+from utils.token_service import create_access_token as issue_token
 
-load_dotenv()
-
-SECRET_KEY = os.getenv("JWT_SECRET")
-ALGORITHM = "HS256"
 
 def create_access_token(data: dict):
-    to_encode = data.copy()
-    expire = datetime.datetime.utcnow() + datetime.timedelta(hours=2)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    # Same secret, expiry and "sub" claim as every other issuer (see utils/token_service)
+    subject = data.get("sub") or data.get("phone")
+    extra = {k: v for k, v in data.items() if k not in ("sub", "phone", "exp")}
+    return issue_token(subject, extra_claims=extra)
@@ -0,0 +1,198 @@
+"""Request latency histograms, in-flight gauge and per-request stage timers.
+
+``MetricsMiddleware`` is a plain ASGI middleware, so the per-request state it
+puts in a context variable is visible inside handlers, where
+``with stage("inference"): ...`` attributes time to a named stage. Everything
+is exposed in Prometheus text format by ``render_prometheus()``.
+"""
+import contextvars
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from utils.config import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, series in items:
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, label_values))
+            sep = "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base}{sep}le="+Inf"}} {series[-1]}')
+            labels = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.value = 0  # only touched from the event loop thread
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+request_latency = Histogram("http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+stage_latency = Histogram("http_request_stage_seconds", "Time spent in named stages inside handlers", ("route", "stage"))
+in_flight = Gauge("http_requests_in_flight", "Requests currently being handled")
+mongo_command_latency = Histogram("mongo_command_duration_seconds", "MongoDB command round-trip time", ("command", "outcome"))
+
+# Extra exposition lines from other subsystems (pool sizes, cache hit counts, ...)
+collectors = []
+
+
+class RequestState:
+    __slots__ = ("scope", "stages")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.stages: dict[str, float] = {}
+
+    @property
+    def route(self) -> str:
+        # FastAPI puts the matched route into the (shared) scope during routing
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "unmatched"
+
+
+_request_state: contextvars.ContextVar[RequestState | None] = contextvars.ContextVar("request_state", default=None)
+
+
+class stage:
+    """Time a block inside a handler: ``with stage("db"): ...``. A no-op outside requests."""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def record_stage(name: str, seconds: float):
+    # For timings measured elsewhere (e.g. driver events); stages repeat-add within a request
+    state = _request_state.get()
+    if state is not None:
+        state.stages[name] = state.stages.get(name, 0.0) + seconds
+        stage_latency.observe(seconds, state.route, name)
+
+
+# ─── Sampled profiling of slow requests ───
+_profile_lock = threading.Lock()
+
+
+def _report_profile(profiler: cProfile.Profile, route: str, elapsed: float):
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(settings.metrics_profile_top)
+    print(f"🐢 Slow request {route} took {elapsed:.3f}s; profile (event loop thread):\n{out.getvalue()}")
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state = RequestState(scope)
+        token = _request_state.set(state)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if state.stages:
+                    timing = ", ".join(f"{name};dur={secs * 1000:.1f}" for name, secs in state.stages.items())
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        # cProfile sees everything on the loop thread while enabled (other requests too),
+        # and only one profiler may run at a time
+        profiler = None
+        if settings.metrics_profile_sample_rate > 0 and random.random() < settings.metrics_profile_sample_rate:
+            if _profile_lock.acquire(blocking=False):
+                profiler = cProfile.Profile()
+                profiler.enable()
+
+        in_flight.value += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.value -= 1
+            request_latency.observe(elapsed, scope["method"], state.route, str(status))
+            _request_state.reset(token)
+            if profiler is not None:
+                profiler.disable()
+                _profile_lock.release()
+                if elapsed >= settings.metrics_slow_request_seconds:
+                    _report_profile(profiler, state.route, elapsed)
+
+
+def stats_collector(prefix: str, stats_fn):
+    """Expose the numeric fields of an existing ``stats()`` dict as gauges; nested dicts become name segments."""
+
+    def gauges(name: str, stats: dict) -> list[str]:
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                lines += gauges(f"{name}_{key}", value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                lines += [f"# TYPE {name}_{key} gauge", f"{name}_{key} {value}"]
+        return lines
+
+    def collect() -> list[str]:
+        return gauges(f"agrogpt_{prefix}", stats_fn())
+
+    return collect
+
+
+def render_prometheus() -> str:
+    lines = request_latency.render() + stage_latency.render() + in_flight.render() + mongo_command_latency.render()
+    for collect in collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
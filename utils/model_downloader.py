@@ -1,20 +1,160 @@
+import hashlib
 import os
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-def download_file(url: str, dest_path: str):
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+CHUNK_SIZE = 1024 * 1024
+TIMEOUT = 60
+RETRIES = 3
+WORKERS = 4
+
+
+class DownloadError(Exception):
+    pass
+
+
+class ProgressReporter:
+    """Prints per-file progress every ``step`` percent, and once when done."""
+
+    def __init__(self, step: int = 10):
+        self.step = step
+        self.lock = threading.Lock()
+        self.last = {}
+
+    def __call__(self, path: str, done: int, total: int | None):
+        if not total:
+            return
+        percent = done * 100 // total
+        with self.lock:
+            if percent // self.step == self.last.get(path, -1) // self.step and percent < 100:
+                return
+            self.last[path] = percent
+        print(f"⬇️ {os.path.basename(path)}: {percent}% ({done / 1e6:.1f}/{total / 1e6:.1f} MB)")
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _verify(path: str, sha256: str | None, size: int | None) -> str | None:
+    # Returns a reason when the file does not match the manifest
+    actual_size = os.path.getsize(path)
+    if size is not None and actual_size != size:
+        return f"size {actual_size} != expected {size}"
+    if sha256 is not None and _sha256_file(path) != sha256.lower():
+        return "sha256 mismatch"
+    return None
+
+
+def _fetch(url: str, part_path: str, progress, session) -> None:
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+    with session.get(url, stream=True, headers=headers, timeout=TIMEOUT) as response:
+        if response.status_code == 416:
+            # Nothing left past our offset: the partial file is already complete
+            return
+        response.raise_for_status()
+
+        if response.status_code != 206:
+            # Server ignored the Range header; start over
+            offset = 0
+        length = response.headers.get("Content-Length")
+        total = offset + int(length) if length else None
+        mode = "ab" if offset else "wb"
+
+        done = offset
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    f.write(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress(part_path[:-len(".part")], done, total)
+
+
+def download_file(url: str, dest_path: str, sha256: str | None = None, size: int | None = None,
+                  progress=None, session=None, retries: int = RETRIES):
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
 
     if os.path.exists(dest_path):
-        print(f"✅ File already exists: {dest_path}")
-        return
+        problem = _verify(dest_path, sha256, size)
+        if problem is None:
+            print(f"✅ File already exists: {dest_path}")
+            return
+        print(f"⚠️ Existing file is invalid ({problem}), downloading again: {dest_path}")
+        os.remove(dest_path)
+
+    import requests
+
+    part_path = dest_path + ".part"
+    session = session or requests.Session()
 
     print(f"⬇️ Downloading: {dest_path}")
-    response = requests.get(url, stream=True)
-    response.raise_for_status()
+    for attempt in range(1, retries + 1):
+        try:
+            _fetch(url, part_path, progress, session)
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+            if attempt == retries:
+                raise DownloadError(f"{dest_path}: giving up after {retries} attempts: {e}") from e
+            print(f"⚠️ Download interrupted ({e}), resuming: {dest_path}")
+            time.sleep(min(2 ** attempt, 10))
 
-    with open(dest_path, "wb") as f:
-        for chunk in response.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+    problem = _verify(part_path, sha256, size)
+    if problem is not None:
+        # A corrupt partial would poison every later resume
+        os.remove(part_path)
+        raise DownloadError(f"{dest_path}: {problem}")
 
+    os.replace(part_path, dest_path)
     print(f"✅ Download completed: {dest_path}")
+
+
+def manifest_artifacts(model_urls: dict) -> list[dict]:
+    """Flatten MODEL_URLS into url/path/sha256/size entries.
+
+    Single artifacts carry "url" and "path"; directories carry "dir" and "files",
+    whose values are a Drive file id or a dict with "id", "sha256" and "size".
+    """
+    artifacts = []
+    for entry in model_urls.values():
+        if "url" in entry:
+            artifacts.append({"url": entry["url"], "path": entry["path"], "sha256": entry.get("sha256"), "size": entry.get("size")})
+            continue
+        for filename, spec in entry.get("files", {}).items():
+            if isinstance(spec, str):
+                spec = {"id": spec}
+            artifacts.append({
+                "url": spec.get("url") or f"https://drive.google.com/uc?id={spec['id']}",
+                "path": os.path.join(entry["dir"], filename),
+                "sha256": spec.get("sha256"),
+                "size": spec.get("size"),
+            })
+    return artifacts
+
+
+def download_all(artifacts: list[dict], workers: int = WORKERS, progress=None):
+    import requests
+
+    progress = progress or ProgressReporter()
+    local = threading.local()
+
+    def fetch(artifact):
+        # requests.Session is not thread-safe; one per worker keeps connection reuse
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        download_file(artifact["url"], artifact["path"], artifact.get("sha256"), artifact.get("size"),
+                      progress=progress, session=local.session)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download") as executor:
+        futures = [executor.submit(fetch, artifact) for artifact in artifacts]
+        errors = [f.exception() for f in futures if f.exception() is not None]
+
+    if errors:
+        raise DownloadError("; ".join(str(e) for e in errors))
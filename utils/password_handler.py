@@ -1,9 +1,90 @@
-from passlib.context import CryptContext
+from fastapi import HTTPException, status
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import asyncio
+import pyotp
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from utils.config import settings
+
+@lru_cache(maxsize=None)
+def pwd_context():
+    # passlib and its bcrypt backend probe load on first use, not at import
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
+
+def verify_credentials(plain_password: str, hashed_password: str, totp_secret: str, code: str) -> bool:
+    return verify_password(plain_password, hashed_password) and pyotp.TOTP(totp_secret).verify(code)
+
+def verify_totp(totp_secret: str, code: str, valid_window: int = 0) -> bool:
+    return pyotp.TOTP(totp_secret).verify(code, valid_window=valid_window)
+
+
+# ─── Bounded worker pool ───
+class BoundedExecutor:
+    """Thread pool with a cap on queued work; excess calls fail fast with 503.
+
+    bcrypt is deliberately slow and releases the GIL, so a few dedicated threads
+    keep the event loop free. Rejecting once ``max_workers + max_queue`` calls
+    are pending stops a login burst from piling up behind it.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, retry_after: int = 1):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.retry_after = retry_after
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        # Only touched from the event loop thread, so the counters need no lock
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "capacity": self.capacity,
+            "pending": self.pending,
+            "queued": max(0, self.pending - self.max_workers),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_executor = BoundedExecutor(
+    max_workers=settings.password_workers,
+    max_queue=settings.password_max_queue,
+    retry_after=settings.password_retry_after_seconds,
+)
+
+async def hash_password_async(password: str) -> str:
+    return await password_executor.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+async def verify_credentials_async(plain_password: str, hashed_password: str, totp_secret: str, code: str) -> bool:
+    return await password_executor.run(verify_credentials, plain_password, hashed_password, totp_secret, code)
+
+async def verify_totp_async(totp_secret: str, code: str, valid_window: int = 0) -> bool:
+    return await password_executor.run(verify_totp, totp_secret, code, valid_window)
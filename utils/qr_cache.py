@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from fastapi import Request, Response
+
+from utils.config import settings
+from utils.scratch import ScratchStore, scratch_store
+
+
+def render_default(uri: str) -> bytes:
+    import qrcode
+
+    buf = io.BytesIO()
+    qrcode.make(uri).save(buf)
+    return buf.getvalue()
+
+
+def render_compact(uri: str) -> bytes:
+    import qrcode
+
+    qr = qrcode.QRCode(border=2)
+    qr.add_data(uri)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+RENDERERS = {
+    "default": render_default,
+    "compact": render_compact,
+}
+
+
+class QRCache:
+    """LRU of rendered provisioning-URI QR PNGs, optionally spilling evictions to scratch storage.
+
+    Entries are keyed by a hash of the URI (which embeds the TOTP secret), so a
+    rotated secret never serves a stale code; the user's previous entry is
+    dropped as soon as a new key is seen for them. A user stays tracked while
+    their spilled copy exists, so a rotation also deletes that file; at most
+    ``spill_max_entries`` spilled copies are tracked, older ones are deleted.
+    """
+
+    def __init__(self, max_entries: int, spill: ScratchStore | None = None, spill_max_entries: int = 8192):
+        self.max_entries = max_entries
+        self.spill = spill
+        self.spill_max_entries = spill_max_entries
+
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._spilled: OrderedDict[str, None] = OrderedDict()  # keys evicted to spill, oldest first
+        self._user_keys: dict[str, str] = {}
+        self._key_users: dict[str, str] = {}  # reverse of _user_keys, to forget a user on eviction
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.spill_hits = 0
+        self.renders = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(uri: str, style: str) -> str:
+        return hashlib.sha256(f"{style}\n{uri}".encode()).hexdigest()
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return f'"{key[:32]}"'
+
+    @staticmethod
+    def _spill_name(key: str) -> str:
+        return f"qr_{key}.png"
+
+    def track(self, user: str, key: str):
+        with self._lock:
+            old = self._user_keys.get(user)
+            if old == key:
+                return
+            self._user_keys[user] = key
+            self._key_users[key] = user
+            if old is None:
+                return
+            self._key_users.pop(old, None)
+            self._entries.pop(old, None)
+            self._spilled.pop(old, None)
+            self.invalidations += 1
+        if self.spill is not None:
+            self.spill.delete(self._spill_name(old))
+
+    def invalidate(self, user: str):
+        with self._lock:
+            old = self._user_keys.pop(user, None)
+            if old is None:
+                return
+            self._key_users.pop(old, None)
+            self._entries.pop(old, None)
+            self._spilled.pop(old, None)
+            self.invalidations += 1
+        if self.spill is not None:
+            self.spill.delete(self._spill_name(old))
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            png = self._entries.get(key)
+            if png is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return png
+
+    def _forget(self, key: str):
+        # A user only ever has one cached key, so this was their last copy
+        user = self._key_users.pop(key, None)
+        if user is not None and self._user_keys.get(user) == key:
+            del self._user_keys[user]
+
+    def _store(self, key: str, png: bytes):
+        evicted = []
+        dropped = []
+        with self._lock:
+            self._entries[key] = png
+            self._entries.move_to_end(key)
+            self._spilled.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                old_key, old_png = self._entries.popitem(last=False)
+                evicted.append((old_key, old_png))
+                if self.spill is None:
+                    self._forget(old_key)
+                else:
+                    # Still tracked: a later rotation must find and delete the spilled PNG
+                    self._spilled[old_key] = None
+            while len(self._spilled) > self.spill_max_entries:
+                old_key, _ = self._spilled.popitem(last=False)
+                self._forget(old_key)
+                dropped.append(old_key)
+        if self.spill is not None:
+            for old_key, old_png in evicted:
+                self.spill.write(self._spill_name(old_key), old_png)
+            # Untracked copies could outlive a rotation of their secret, so they go too
+            for old_key in dropped:
+                self.spill.delete(self._spill_name(old_key))
+
+    def load_or_render(self, key: str, uri: str, style: str) -> bytes:
+        # Blocking (disk / rendering); call from a worker thread
+        if self.spill is not None:
+            path = self.spill.path(self._spill_name(key))
+            if path is not None:
+                try:
+                    with open(path, "rb") as f:
+                        png = f.read()
+                    self.spill_hits += 1
+                    self._store(key, png)
+                    return png
+                except FileNotFoundError:
+                    pass
+
+        png = RENDERERS[style](uri)
+        self.renders += 1
+        self._store(key, png)
+        return png
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "tracked_users": len(self._user_keys),
+                "spilled": len(self._spilled),
+                "spill": self.spill is not None,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "renders": self.renders,
+                "invalidations": self.invalidations,
+            }
+
+
+qr_cache = QRCache(
+    max_entries=settings.qr_cache_max_entries,
+    spill=scratch_store if settings.qr_cache_spill else None,
+    spill_max_entries=settings.qr_cache_spill_max_entries,
+)
+
+
+async def qr_png_response(request: Request, user: str, uri: str, style: str = "default") -> Response:
+    key = qr_cache.key(uri, style)
+    qr_cache.track(user, key)
+
+    headers = {"ETag": qr_cache.etag(key), "Cache-Control": "private, no-cache"}
+    # The ETag is derived from the URI, so a matching client needs no rendering at all
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+
+    png = qr_cache.get(key)
+    if png is None:
+        png = await asyncio.to_thread(qr_cache.load_or_render, key, uri, style)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+
+async def prerender_qr(user: str, uri: str, style: str = "default"):
+    key = qr_cache.key(uri, style)
+    qr_cache.track(user, key)
+    if qr_cache.get(key) is None:
+        await asyncio.to_thread(qr_cache.load_or_render, key, uri, style)
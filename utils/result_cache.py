@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ResultCache:
+    """LRU + TTL cache for inference results keyed by content hash and model version.
+
+    With ``persist_path`` set, entries are also written to a local SQLite file so
+    they survive restarts; the in-memory LRU stays the first lookup. SQLite is
+    never touched on the event loop: misses read it on a worker thread, and
+    writes are queued to a single writer thread without awaiting them. The
+    writer also keeps the file bounded: at most ``disk_max_entries`` rows
+    (soonest-expiring go first) and expired rows purged every
+    ``purge_interval`` seconds.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, persist_path: str | None = None,
+                 disk_max_entries: int = 100000, purge_interval: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self.disk_max_entries = disk_max_entries
+        self.purge_interval = purge_interval
+
+        self._entries: OrderedDict[str, tuple[object, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.disk_purged = 0
+
+        self._db = None
+        self._disk_rows = 0  # upper bound between prunes; only the writer thread touches it
+        self._next_purge = 0.0
+        self._db_lock = threading.Lock()
+        self._writer: ThreadPoolExecutor | None = None
+        if persist_path:
+            self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="result-cache-writer")
+            self._db = sqlite3.connect(persist_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_expires_at ON results (expires_at)")
+            self._prune(time.time())
+
+    @staticmethod
+    def make_key(data: bytes, model_version: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        return f"{model_version}:{digest}"
+
+    def _store(self, key: str, value, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _memory_get(self, key: str, now: float):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+        return None
+
+    def _disk_get(self, key: str, now: float):
+        with self._db_lock:
+            row = self._db.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= now:
+            return None
+        value = json.loads(row[0])
+        with self._lock:
+            self._store(key, value, row[1])
+            self.disk_hits += 1
+        return value
+
+    def _prune(self, now: float):
+        with self._db_lock:
+            self.disk_purged += self._db.execute("DELETE FROM results WHERE expires_at <= ?", (now,)).rowcount
+            rows = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            if rows > self.disk_max_entries:
+                # Trim to 90% of the cap so the next prune isn't one write away
+                excess = rows - self.disk_max_entries * 9 // 10
+                self._db.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY expires_at LIMIT ?)", (excess,)
+                )
+                self.disk_evictions += excess
+                rows -= excess
+        self._disk_rows = rows
+        self._next_purge = now + self.purge_interval
+
+    def _disk_put(self, key: str, value, expires_at: float):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+        self._disk_rows += 1
+        now = time.time()
+        if self._disk_rows > self.disk_max_entries or now >= self._next_purge:
+            self._prune(now)
+
+    async def get(self, key: str):
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        if value is None:
+            with self._lock:
+                self.misses += 1
+        return value
+
+    async def put(self, key: str, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self._writer is not None:
+            self._writer.submit(self._disk_put, key, value, expires_at)
+
+    def close(self):
+        # Flush queued writes
+        if self._writer is not None:
+            self._writer.shutdown(wait=True)
+            self._writer = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "persistent": self._db is not None,
+            "disk_rows": self._disk_rows,
+            "disk_max_entries": self.disk_max_entries,
+            "disk_evictions": self.disk_evictions,
+            "disk_purged": self.disk_purged,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,143 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.config import settings
+
+
+class ScratchStore:
+    """Size-capped, TTL-evicted directory for temporary artifacts (uploads, QR codes).
+
+    Entries are tracked in write order, so the oldest file is evicted first when
+    the total size goes over ``max_bytes``. A background sweeper removes expired
+    files between writes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float, sweep_interval: float = 60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._entries: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: threading.Thread | None = None
+
+        self.writes = 0
+        self.evicted_expired = 0
+        self.evicted_size = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._adopt_existing()
+
+    def _adopt_existing(self):
+        # Files left behind by a previous process count towards the cap too
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(found):
+            self._entries[name] = (size, mtime)
+            self._bytes += size
+
+    def _path(self, name: str) -> str:
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            raise ValueError(f"Invalid scratch file name: {name!r}")
+        return os.path.join(self.directory, name)
+
+    def _remove(self, name: str):
+        size, _ = self._entries.pop(name)
+        self._bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def _evict_over_cap(self):
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evicted_size += 1
+
+    def write(self, name: str, data: bytes) -> str:
+        path = self._path(name)
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if name in self._entries:
+                self._bytes -= self._entries.pop(name)[0]
+            self._entries[name] = (len(data), time.time())
+            self._bytes += len(data)
+            self.writes += 1
+            self._evict_over_cap()
+        return path
+
+    def path(self, name: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            if time.time() - entry[1] > self.ttl:
+                self._remove(name)
+                self.evicted_expired += 1
+                return None
+        return self._path(name)
+
+    def delete(self, name: str):
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+
+    def sweep(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            # Entries are in write order, so expired ones are at the front
+            while self._entries:
+                name, (_, written_at) = next(iter(self._entries.items()))
+                if written_at > cutoff:
+                    break
+                self._remove(name)
+                self.evicted_expired += 1
+            self._evict_over_cap()
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print("❌ Scratch sweep failed:", e)
+
+    def start(self):
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="scratch-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "writes": self.writes,
+                "evicted_expired": self.evicted_expired,
+                "evicted_size": self.evicted_size,
+            }
+
+
+scratch_store = ScratchStore(
+    os.path.join(os.getcwd(), "tmp"),
+    max_bytes=settings.scratch_max_bytes,
+    ttl_seconds=settings.scratch_ttl_seconds,
+    sweep_interval=settings.scratch_sweep_interval_seconds,
+)
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+from collections import OrderedDict
+import threading
+import time
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+
+from database.repositories import users_repo
+from utils.config import settings
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+SECRET_KEY = settings.jwt_secret
+ALGORITHM = settings.jwt_algorithm
+
+
+def create_access_token(subject: str, expires_delta: timedelta | None = None, extra_claims: dict | None = None) -> str:
+    # python-jose pulls in its crypto backends; import on first use
+    from jose import jwt
+
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
+    claims = dict(extra_claims or {})
+    claims.update({"sub": subject, "exp": expire})
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+class VerifiedTokenCache:
+    """Tokens that already passed signature and expiry checks, mapped to their subject.
+
+    An entry lives for at most ``ttl`` seconds and never past the token's own
+    ``exp``, so a cached token can't outlive its validity.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, subject: str, exp: float):
+        with self._lock:
+            self._entries[token] = (subject, min(exp, time.time() + self.ttl))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+token_cache = VerifiedTokenCache(max_entries=settings.token_cache_max_entries, ttl=settings.token_cache_ttl_seconds)
+
+
+def _unauthorized():
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def decode_subject(token: str) -> str:
+    subject = token_cache.get(token)
+    if subject is not None:
+        return subject
+
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise _unauthorized()
+
+    # "phone" is the claim older utils/jwt_handler tokens carried
+    subject = payload.get("sub") or payload.get("phone")
+    exp = payload.get("exp")
+    if subject is None or exp is None:
+        raise _unauthorized()
+
+    token_cache.put(token, subject, float(exp))
+    return subject
+
+
+def get_current_subject(token: str = Depends(oauth2_scheme)) -> str:
+    return decode_subject(token)
+
+
+async def get_current_user(subject: str = Depends(get_current_subject)) -> dict:
+    # main's /verify-totp puts the email in "sub"; routes/auth logins put the phone
+    user = await users_repo.find_by_email(subject) or await users_repo.find_by_phone(subject)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User not found")
+    return user
@@ -0,0 +1,194 @@
+import asyncio
+import re
+import threading
+from collections import OrderedDict
+from typing import Literal, get_args
+
+from utils.config import settings
+
+# The app's languages; routes take ``lang: Language`` so arbitrary query values are rejected
+Language = Literal["en", "hi", "te"]
+LANGUAGES = frozenset(get_args(Language))
+
+# Numbers are lifted out before translating, so "95.12% confidence" and
+# "87.50% confidence" share one cached translation
+NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+PLACEHOLDER_RE = re.compile(r"\{(\d+)\}")
+
+
+def templatize(text: str) -> tuple[str, list[str]]:
+    values = []
+
+    def replace(match):
+        values.append(match.group(0))
+        return f"{{{len(values) - 1}}}"
+
+    # Braces already in the text would be mistaken for placeholders
+    if "{" in text or "}" in text:
+        return text, []
+    return NUMBER_RE.sub(replace, text), values
+
+
+def fill(template: str, values: list[str]) -> str:
+    return PLACEHOLDER_RE.sub(lambda m: values[int(m.group(1))], template)
+
+
+def placeholders_intact(translated: str, count: int) -> bool:
+    return sorted(int(i) for i in PLACEHOLDER_RE.findall(translated)) == list(range(count))
+
+
+class PhraseCache:
+    """LRU of translated phrases keyed by (source, target, template)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple[str, str, str], str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple[str, str, str], record: bool = True) -> str | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += record
+                return None
+            self._entries.move_to_end(key)
+            self.hits += record
+            return value
+
+    def put(self, key: tuple[str, str, str], value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class Translator:
+    """Argos Translate models, loaded lazily once per process, behind a phrase cache.
+
+    A missing package or language pair degrades to returning the source text.
+    """
+
+    def __init__(self, cache: PhraseCache):
+        self.cache = cache
+        self._models: dict[tuple[str, str], object] = {}
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.model_calls = 0
+        self.placeholder_fallbacks = 0
+
+    def _pair_lock(self, pair: tuple[str, str]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(pair, threading.Lock())
+
+    def _load(self, source: str, target: str):
+        # Unknown codes never create entries in _models/_locks
+        if source not in LANGUAGES or target not in LANGUAGES:
+            return None
+        pair = (source, target)
+        if pair in self._models:
+            return self._models[pair]
+
+        with self._pair_lock(pair):
+            if pair in self._models:
+                return self._models[pair]
+            model = None
+            try:
+                from argostranslate import translate as argos
+
+                languages = {lang.code: lang for lang in argos.get_installed_languages()}
+                if source in languages and target in languages:
+                    model = languages[source].get_translation(languages[target])
+                if model is None:
+                    print(f"⚠️ No Argos model installed for {source}->{target}; run download_languages.py")
+                else:
+                    print(f"✅ Translation model loaded: {source}->{target}")
+            except ImportError:
+                print("⚠️ argostranslate is not installed; responses stay in English")
+            self._models[pair] = model
+            return model
+
+    def _run(self, model, pair: tuple[str, str], text: str) -> str:
+        # Argos/CTranslate2 translators are not shared across threads
+        with self._pair_lock(pair):
+            self.model_calls += 1
+            return model.translate(text)
+
+    def translate(self, text: str, target: str, source: str = "en") -> str:
+        # Blocking on a cache miss; use translate_async from request handlers
+        cached = self.translate_cached(text, target, source)
+        if cached is not None:
+            return cached
+        return self.translate_uncached(text, target, source)
+
+    def translate_cached(self, text: str, target: str, source: str = "en", record: bool = True) -> str | None:
+        if target == source or not text.strip() or source not in LANGUAGES or target not in LANGUAGES:
+            return text
+        template, values = templatize(text)
+        cached = self.cache.get((source, target, template), record)
+        return fill(cached, values) if cached is not None else None
+
+    def translate_uncached(self, text: str, target: str, source: str = "en") -> str:
+        model = self._load(source, target)
+        if model is None:
+            return text
+
+        template, values = templatize(text)
+        translated = self._run(model, (source, target), template)
+        if placeholders_intact(translated, len(values)):
+            self.cache.put((source, target, template), translated)
+            return fill(translated, values)
+
+        # The model dropped or mangled a placeholder; translate the literal text
+        self.placeholder_fallbacks += 1
+        return self._run(model, (source, target), text)
+
+    def translate_many(self, texts: list[str], target: str, source: str = "en") -> list[str]:
+        # Texts sharing a template ("a 1", "a 2") only reach the model once
+        results = []
+        for text in texts:
+            cached = self.translate_cached(text, target, source, record=False)
+            results.append(cached if cached is not None else self.translate_uncached(text, target, source))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "loaded_pairs": [f"{s}->{t}" for (s, t), m in self._models.items() if m is not None],
+            "model_calls": self.model_calls,
+            "placeholder_fallbacks": self.placeholder_fallbacks,
+            "cache": self.cache.stats(),
+        }
+
+
+translator = Translator(PhraseCache(max_entries=settings.translation_cache_max_entries))
+
+
+async def translate_async(text: str, target: str, source: str = "en") -> str:
+    # Cache hits are answered on the event loop; only misses pay for a thread hop
+    cached = translator.translate_cached(text, target, source)
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(translator.translate_uncached, text, target, source)
+
+
+async def translate_batch_async(texts: list[str], target: str, source: str = "en") -> list[str]:
+    results: list[str | None] = [translator.translate_cached(text, target, source) for text in texts]
+    pending = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+    if pending:
+        # One thread hop for the whole batch; repeated texts are translated once
+        translated = dict(zip(pending, await asyncio.to_thread(translator.translate_many, pending, target, source)))
+        results = [r if r is not None else translated[t] for t, r in zip(texts, results)]
+    return results
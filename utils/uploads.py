@@ -0,0 +1,53 @@
+import asyncio
+import io
+import os
+import uuid
+
+from fastapi import HTTPException, UploadFile
+
+from utils.config import settings
+from utils.metrics import stage
+from utils.scratch import scratch_store
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_upload(file: UploadFile, max_bytes: int | None = None) -> bytes:
+    max_bytes = max_bytes or settings.max_upload_bytes
+
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {max_bytes} bytes.")
+
+    buf = bytearray()
+    with stage("upload_read"):
+        while chunk := await file.read(CHUNK_SIZE):
+            buf += chunk
+            if len(buf) > max_bytes:
+                raise HTTPException(status_code=413, detail=f"File too large. Maximum size is {max_bytes} bytes.")
+    return bytes(buf)
+
+
+def _decode(data: bytes):
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data))
+    img.load()
+    return img
+
+
+async def decode_image(data: bytes):
+    from PIL import Image
+
+    try:
+        with stage("decode"):
+            return await asyncio.to_thread(_decode, data)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+
+
+async def archive_upload(data: bytes, filename: str | None) -> str | None:
+    # Uploads are only kept on disk when explicitly asked for (debugging / dataset collection)
+    if not settings.archive_uploads:
+        return None
+    name = f"{uuid.uuid4().hex}_{os.path.basename(filename or 'upload')}"
+    return await asyncio.to_thread(scratch_store.write, name, data)